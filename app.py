@@ -2,18 +2,30 @@ import streamlit as st
 import pandas as pd
 import os
 from pathlib import Path
+from src.news_db import get_news_db
 
-# 讀取指定的新聞數據
+# 資料庫中有選中新聞的訂閱源，以舊版 CSV 檔名為鍵
+def get_db_feeds():
+    return {f"{source}_{feed}.csv": (source, feed) for source, feed in get_news_db().list_feeds(chosen_only=True)}
+
+# 讀取指定的新聞數據，資料庫沒有時讀取舊版 CSV
 def load_news(file_name):
-    return pd.read_csv(file_name)
+    feeds = get_db_feeds()
+    if file_name in feeds:
+        return get_news_db().read_articles(*feeds[file_name])
+    return pd.read_csv(os.path.join('./data/news', file_name))
 
 # 讀取重要新聞數據
 def load_important_news(file_name):
+    feeds = get_db_feeds()
+    if file_name in feeds:
+        return get_news_db().read_chosen(*feeds[file_name])
     return pd.read_csv(os.path.join('./data/news_chosen', file_name))
 
-# 獲取 data/news/ 目錄下的所有 CSV 文件
+# 獲取資料庫中的訂閱源與 data/news_chosen/ 目錄下的所有 CSV 文件
 def get_news_files():
-    return [f for f in os.listdir('./data/news_chosen') if f.endswith('.csv')]
+    csv_files = [f for f in os.listdir('./data/news_chosen') if f.endswith('.csv')] if os.path.isdir('./data/news_chosen') else []
+    return sorted(set(get_db_feeds()) | set(csv_files))
 
 # 生成安全的文件名
 def generate_safe_filename(url):
@@ -65,7 +77,7 @@ def main():
 
     # 顯示所有新聞
     st.header("所有新聞")
-    news_data = load_news(os.path.join('./data/news', selected_news_file))
+    news_data = load_news(selected_news_file)
     for index, row in news_data.iterrows():
         with st.expander(f"{row['ai_title']} - {row['published']}"):
             st.write(f"摘要：{row['ai_summary']}")
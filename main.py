@@ -2,10 +2,8 @@ from src.config.log_config import setup_logger
 from pathlib import Path
 import argparse
 import yaml
-from src.ai_news import AINews
-from src.ai_chose import AIChose
-from src.ai_rewrite import AIRewrite
-from src.ai_broadcast import AIBroadcast
+from src.llm_cache import get_llm_cache
+from src.pipeline import NewsPipeline
 
 # logger = setup_logger(__name__)
 
@@ -21,8 +19,31 @@ def parse_arguments():
     parser.add_argument('--output', default='./data/news/{source}_{feed_name}.csv', help='輸出CSV檔案路徑')
     parser.add_argument('--chosen_output', default='./data/news_chosen/{source}_{feed_name}_chosen.csv', help='重要新聞輸出CSV檔案路徑')
     parser.add_argument('--num_chosen', type=int, default=5, help='選擇的重要新聞數量')
+    parser.add_argument('--feeds', nargs='+', metavar='SOURCE[/FEED]', help='一次處理多個 feed，例如 bbc/World cnn（只寫來源代表該來源的所有 feed）')
+    parser.add_argument('--all-feeds', action='store_true', help='處理設定檔中的所有 feed')
+    parser.add_argument('--voice', default='nova', choices=['alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer'], help='語音播報使用的語音')
+    parser.add_argument('--bulletin', action='store_true', help='另外為每個 feed 生成單一集每日快報')
+    parser.add_argument('--feed-workers', type=int, default=2, help='同時爬取與選擇的 feed 數量')
+    parser.add_argument('--rewrite-workers', type=int, default=4, help='同時改寫的新聞數量')
+    parser.add_argument('--tts-workers', type=int, default=2, help='同時合成語音的新聞數量')
+    parser.add_argument('--queue-size', type=int, default=8, help='各階段之間佇列的容量上限')
     return parser.parse_args()
 
+def resolve_feeds(rss_config, specs):
+    """把 source 或 source/feed 的描述展開成 feed 清單"""
+    feeds = []
+    for spec in specs:
+        source_key, _, feed_name = spec.partition('/')
+        source = rss_config['news_sources'].get(source_key)
+        if source is None:
+            print(f"找不到新聞來源: {source_key}")
+            continue
+        matched = [feed for feed in source['feeds'] if not feed_name or feed['name'] == feed_name]
+        if not matched:
+            print(f"找不到 feed: {spec}")
+        feeds.extend({'source': source_key, 'feed_name': feed['name'], 'rss_url': feed['url']} for feed in matched)
+    return feeds
+
 def select_source_and_feed(rss_config):
     print("可用的新聞源:")
     for i, (key, source) in enumerate(rss_config['news_sources'].items(), 1):
@@ -65,43 +86,42 @@ def main():
     args = parse_arguments()
     rss_config = load_rss_config()
 
-    if not args.rss_url or not args.source or not args.feed_name:
-        source, feed_name, rss_url = select_source_and_feed(rss_config)
-        if not source or not feed_name or not rss_url:
-            return
-        args.source = source
-        args.feed_name = feed_name
-        args.rss_url = rss_url
+    if args.all_feeds:
+        feeds = resolve_feeds(rss_config, list(rss_config['news_sources']))
+    elif args.feeds:
+        feeds = resolve_feeds(rss_config, args.feeds)
+    else:
+        if not args.rss_url or not args.source or not args.feed_name:
+            source, feed_name, rss_url = select_source_and_feed(rss_config)
+            if not source or not feed_name or not rss_url:
+                return
+            args.source = source
+            args.feed_name = feed_name
+            args.rss_url = rss_url
+        feeds = [{'source': args.source, 'feed_name': args.feed_name, 'rss_url': args.rss_url}]
+    if not feeds:
+        print("沒有要處理的 feed")
+        return
 
     # 確保輸出目錄存在
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
     Path(args.chosen_output).parent.mkdir(parents=True, exist_ok=True)
 
     try:
-        # 執行 AI 新聞爬取
-        print("開始處理新聞數據")
-        ai_news = AINews(args.rss_url, args.source, args.feed_name)
-        ai_news.run()
-        print("新聞數據處理完成")
-
-        # 執行 AI 新聞選擇
-        print("開始選擇重要新聞")
-        ai_chose = AIChose(args.source, args.feed_name, args.num_chosen)
-        ai_chose.run()
-        print("重要新聞選擇完成")
-
-        # 執行 AI 重寫
-        print("開始重寫重要新聞")
-        ai_rewrite = AIRewrite()
-        ai_rewrite.run(ai_chose.output_filename)
-        print("重要新聞重寫完成")
-
-        # 執行 AI 語音播報
-        print("開始生成語音播報")
-        voice = "nova"  # 這裡可以設置一個默認的語音選項，或從 args 中獲取
-        ai_broadcast = AIBroadcast(args.source, args.feed_name, voice)
-        ai_broadcast.run()
-        print("語音播報生成完成")
+        # 爬取摘要、選擇、改寫、語音播報以佇列串接，選出第一則新聞後就開始改寫與合成
+        print(f"開始處理 {len(feeds)} 個 feed")
+        pipeline = NewsPipeline(
+            num_chosen=args.num_chosen,
+            voice=args.voice,
+            feed_workers=args.feed_workers,
+            rewrite_workers=args.rewrite_workers,
+            tts_workers=args.tts_workers,
+            queue_size=args.queue_size,
+            bulletin=args.bulletin,
+        )
+        pipeline.run(feeds)
+        print("新聞處理流程完成")
+        get_llm_cache().log_stats()
 
     except Exception as e:
         print(f"執行程中發生錯誤: {str(e)}")
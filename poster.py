@@ -1,19 +1,29 @@
 import schedule
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.ai_news import AINews
+from src.proxy_pool import get_proxy_pool
 from src.config.log_config import setup_logger
 import yaml
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import pandas as pd
 import json
 from openai import OpenAI
 from pydantic import BaseModel
 from datetime import datetime
-from utils.file_utils import get_safe_filename, ensure_dir, get_file_path
+from src.content_cleaner import ContentCleaner
+from src.llm_cache import get_llm_cache
+from src.news_db import get_news_db
+from src.prompt_compiler import CompiledNewsList, log_prompt_usage
+from src.news_cluster import NewsClusterer, UnionFind, char_shingles
+from src.topic_groups import TopicGroupStore
+from src.article_index import ArticleIndex
+from utils.file_utils import ensure_dir
 
 class NewsGroup(BaseModel):
-    links: List[str]
+    ids: List[str]
     tag: str
     importance_score: float
 
@@ -26,11 +36,35 @@ class NewsSummary(BaseModel):
     headline: str
     main_body: str
 
+def tool_arguments(response, name: str) -> Dict:
+    """取出指定工具呼叫的參數，沒有該工具呼叫時拋出例外"""
+    tool_call = response.choices[0].message.tool_calls[0]
+    if tool_call.function.name != name:
+        raise ValueError(f"Unexpected function call: {tool_call.function.name}")
+    return json.loads(tool_call.function.arguments)
+
 class Poster:
-    def __init__(self):
+    def __init__(self, max_workers: int = 5, use_proxy: bool = False, group_token_budget: int = 12000,
+                 cluster_threshold: float = 0.5, group_shard_size: int = 150, group_parallelism: int = 4,
+                 tag_merge_threshold: float = 0.6, topic_ttl_hours: float = 24, max_inflight_group_summaries: int = 4,
+                 content_cache_size: int = 256):
         self.logger = setup_logger(__name__)
         self.config_path = Path("./src/config/rss_feed.yaml")
         self.keyword = "Market"  # 參數化關鍵字
+        self.max_workers = max(1, max_workers)  # 同時處理的訂閱源數量上限，設為 1 即為逐一處理
+        self.use_proxy = use_proxy
+        self.group_token_budget = group_token_budget  # 每個新聞組摘要呼叫的內容 token 上限，由組內文章平分
+        self.cleaner = ContentCleaner()
+        # 送進 LLM 分組前，先在本地把近似重複的新聞聚成候選群組，只送出每群的代表
+        self.clusterer = NewsClusterer(threshold=cluster_threshold)
+        self.group_shard_size = max(1, group_shard_size)  # 每次分組呼叫最多送出的候選群組數，超過時分片處理
+        self.group_parallelism = max(1, group_parallelism)  # 同時進行的分片分組請求上限
+        self.tag_merge_threshold = tag_merge_threshold  # 合併分片結果時，標籤相似度達此值即視為同一主題
+        # 跨週期保存的主題分組，超過 topic_ttl_hours 沒有新成員的分組會過期
+        self.topic_groups = TopicGroupStore(ttl_hours=topic_ttl_hours)
+        self.max_inflight_group_summaries = max(1, max_inflight_group_summaries)  # 同時進行的新聞組摘要請求上限
+        self.content_cache_size = content_cache_size  # 文章索引中保留在記憶體的文章內容數量上限
+        self.article_index: Optional[ArticleIndex] = None
         self.rss_config = self.load_rss_config()
         self.ai_news_instances: Dict[str, AINews] = {}
         self.last_processed_time: Dict[str, float] = {}
@@ -73,24 +107,29 @@ class Poster:
         for source, data in self.rss_config["news_sources"].items():
             for feed in data["feeds"]:
                 key = f"{source}_{feed['name']}"
-                self.ai_news_instances[key] = AINews(feed["url"], source, feed["name"])
+                self.ai_news_instances[key] = AINews(feed["url"], source, feed["name"], use_proxy=self.use_proxy)
                 self.last_processed_time[key] = 0
         self.logger.info(f"Initialized {len(self.ai_news_instances)} AINews instances")
 
     def concat_news_data(self):
         all_news = []
+        news_db = get_news_db()
         for key, ai_news in self.ai_news_instances.items():
-            csv_path = Path(f"./data/news/{ai_news.source}_{ai_news.feed_name}.csv")
-            if csv_path.exists():
-                try:
+            try:
+                if news_db.has_feed(ai_news.source, ai_news.feed_name):
+                    df = news_db.read_articles(ai_news.source, ai_news.feed_name)
+                else:
+                    # 資料庫還沒有此訂閱源時讀取舊版 CSV
+                    csv_path = Path(f"./data/news/{ai_news.source}_{ai_news.feed_name}.csv")
+                    if not csv_path.exists():
+                        self.logger.warning(f"No news data found for {key}")
+                        continue
                     df = pd.read_csv(csv_path)
                     df['source'] = ai_news.source
                     df['feed'] = ai_news.feed_name
-                    all_news.append(df)
-                except Exception as e:
-                    self.logger.error(f"Error reading CSV for {key}: {e}")
-            else:
-                self.logger.warning(f"CSV file not found for {key}: {csv_path}")
+                all_news.append(df)
+            except Exception as e:
+                self.logger.error(f"Error reading news data for {key}: {e}")
         
         if all_news:
             combined_df = pd.concat(all_news, ignore_index=True)
@@ -101,6 +140,8 @@ class Poster:
             self.logger.info(f"已將合併的新聞數據保存至 {save_path}")
             
             self.combined_df = combined_df
+            # 每個週期建立一次 link 索引，內容在摘要時才讀取
+            self.article_index = ArticleIndex(combined_df, self.content_cache_size, self.news_content_dir)
             return combined_df
         else:
             self.logger.warning("No news data found to concatenate")
@@ -119,20 +160,23 @@ class Poster:
             self.logger.error(f"Error loading prompt template: {e}")
             raise
 
-    def group_and_tag_news(self, combined_df):
-        client = OpenAI()
-        news_list = combined_df.to_dict(orient='records')
+    def group_shard(self, client, representatives: pd.DataFrame, members: Dict[int, List[str]], shard_label: str = "") -> List[Dict]:
+        """請模型為一批候選群組代表分組並標記，回傳展開成所有新聞 link 的分組"""
+        cluster_of = dict(zip(representatives['link'], representatives['cluster']))
+        # 只保留分組需要的欄位，URL 以短 ID 取代，模型回傳後再換回 link
+        news_list = CompiledNewsList(representatives, ['source', 'articles', 'ai_title', 'ai_summary'])
         
         try:
-            formatted_prompt = self.load_prompt_template().format(
-                news_list=json.dumps(news_list, ensure_ascii=False, indent=2)
-            )
+            formatted_prompt = self.load_prompt_template().format(news_list=news_list.render())
         except Exception as e:
             self.logger.error(f"Error formatting prompt template: {e}")
             return []
         
         try:
-            response = client.chat.completions.create(
+            response = get_llm_cache().chat_completion(
+                client,
+                "group_news",
+                validate=lambda response: 'news_groups' in tool_arguments(response, "output_news_groups"),
                 model="gpt-4o-2024-08-06",
                 temperature=0,
                 messages=[
@@ -148,34 +192,143 @@ class Poster:
                     }
                 }]
             )
+            log_prompt_usage(f"group_news{shard_label}", formatted_prompt, response)
             
             tool_call = response.choices[0].message.tool_calls[0]
-            if tool_call.function.name == "output_news_groups":
-                result = json.loads(tool_call.function.arguments)
-                news_groups = result['news_groups']
-                self.logger.info(f"Grouped news into {len(news_groups)} topics")
-                
-                # 直接在這裡保存分組新聞
-                save_path = self.poster_dir / "grouped_news.csv"
-                data = []
-                for group in news_groups:
-                    for link in group['links']:
-                        data.append({
-                            "link": link,
-                            "tag": group['tag'],
-                            "importance_score": group['importance_score']
-                        })
-                pd.DataFrame(data).to_csv(save_path, index=False, encoding='utf-8')
-                self.logger.info(f"已將分組新聞保存至 {save_path}")
-                
-                return news_groups
-            else:
+            if tool_call.function.name != "output_news_groups":
                 self.logger.warning("Unexpected function call in API response")
                 return []
+            result = json.loads(tool_call.function.arguments)
+            news_groups = []
+            for group in result['news_groups']:
+                # 每個代表展開成其候選群組內的所有新聞
+                links = [link for rep in news_list.resolve(group['ids']) for link in members[cluster_of[rep]]]
+                if links:
+                    news_groups.append({"links": links, "tag": group['tag'], "importance_score": group['importance_score']})
+            return news_groups
         except Exception as e:
-            self.logger.error(f"Error in grouping and tagging news: {e}")
+            self.logger.error(f"Error in grouping and tagging news{shard_label}: {e}")
             return []
 
+    def merge_groups(self, news_groups: List[Dict]) -> List[Dict]:
+        """
+        合併各分片的分組：包含相同新聞或標籤相近的分組視為同一主題。
+
+        合併後沿用重要性最高者的標籤與分數，新聞 link 取聯集。
+        """
+        union_find = UnionFind(len(news_groups))
+        link_owner: Dict[str, int] = {}
+        for i, group in enumerate(news_groups):
+            for link in group['links']:
+                if link in link_owner:
+                    union_find.union(link_owner[link], i)
+                else:
+                    link_owner[link] = i
+            for j in range(i):
+                if self.tags_match(group['tag'], news_groups[j]['tag']):
+                    union_find.union(i, j)
+
+        merged: Dict[int, Dict] = {}
+        for i in sorted(range(len(news_groups)), key=lambda i: news_groups[i]['importance_score'], reverse=True):
+            root = union_find.find(i)
+            if root not in merged:
+                merged[root] = {"links": [], "tag": news_groups[i]['tag'], "importance_score": news_groups[i]['importance_score']}
+            merged[root]['links'].extend(link for link in news_groups[i]['links'] if link not in merged[root]['links'])
+        return list(merged.values())
+
+    def group_and_tag_news(self, combined_df):
+        client = OpenAI()
+        labels = self.clusterer.cluster(combined_df)
+        representatives = self.clusterer.representatives(combined_df, labels)
+        members = self.clusterer.members(combined_df, labels)
+        self.logger.info(f"本地分群：{len(combined_df)} 則新聞 -> {len(representatives)} 個候選群組")
+
+        shards = [representatives.iloc[i:i + self.group_shard_size] for i in range(0, len(representatives), self.group_shard_size)]
+        if len(shards) <= 1:
+            news_groups = self.group_shard(client, representatives, members)
+        else:
+            # 分片平行分組，再於本地合併主題重疊的分組
+            self.logger.info(f"分片分組：{len(shards)} 個分片，每片最多 {self.group_shard_size} 則，並行上限 {self.group_parallelism}")
+            with ThreadPoolExecutor(max_workers=self.group_parallelism, thread_name_prefix="group") as executor:
+                shard_groups = list(executor.map(
+                    lambda item: self.group_shard(client, item[1], members, f"[{item[0] + 1}/{len(shards)}]"),
+                    enumerate(shards),
+                ))
+            news_groups = self.merge_groups([group for groups in shard_groups for group in groups])
+        self.logger.info(f"Grouped news into {len(news_groups)} topics")
+        return news_groups
+
+    def tags_match(self, tag: str, other: str) -> bool:
+        a, b = char_shingles(tag, 2), char_shingles(other, 2)
+        return bool(a and b) and len(a & b) / len(a | b) >= self.tag_merge_threshold
+
+    def assign_to_existing_groups(self, combined_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+        """把與既有分組成員近似重複的新新聞直接加入該分組，回傳其餘仍需分組的新聞"""
+        grouped_links = {link for group in self.topic_groups.groups for link in group['links']}
+        existing_df = combined_df[combined_df['link'].isin(grouped_links)].drop_duplicates('link')
+        if existing_df.empty:
+            return new_df
+
+        pool = pd.concat([existing_df, new_df.drop_duplicates('link')], ignore_index=True)
+        labels = self.clusterer.cluster(pool)
+        group_of_cluster = {}
+        for link, label in zip(pool['link'][:len(existing_df)], labels[:len(existing_df)]):
+            group_of_cluster.setdefault(label, self.topic_groups.group_of(link))
+
+        assigned = set()
+        for link, label in zip(pool['link'][len(existing_df):], labels[len(existing_df):]):
+            if label in group_of_cluster:
+                self.topic_groups.add_links(group_of_cluster[label], [link])
+                assigned.add(link)
+        if assigned:
+            self.logger.info(f"{len(assigned)} 則新新聞已直接加入既有的主題分組")
+        return new_df[~new_df['link'].isin(assigned)]
+
+    def update_topic_groups(self, combined_df: pd.DataFrame) -> List[Dict]:
+        """
+        以本週期的新新聞更新持續保存的主題分組，回傳所有有效分組。
+
+        沒有新新聞時不呼叫模型；新新聞先以本地分群加入既有分組，
+        其餘才送進分組模型，結果依標籤併入相近的既有分組或開新分組。
+        """
+        self.topic_groups.expire()
+        new_df = combined_df[~combined_df['link'].isin(self.topic_groups.known_links())]
+        if new_df.empty:
+            self.logger.info(f"沒有新新聞，沿用既有的 {len(self.topic_groups.groups)} 個主題分組")
+            return self.topic_groups.groups
+
+        self.logger.info(f"本週期新增 {new_df['link'].nunique()} 則新聞")
+        remaining_df = self.assign_to_existing_groups(combined_df, new_df)
+        if not remaining_df.empty:
+            for group in self.group_and_tag_news(remaining_df):
+                similar = next((existing for existing in self.topic_groups.groups
+                                if self.tags_match(group['tag'], existing['tag'])), None)
+                if similar is not None:
+                    self.topic_groups.add_links(similar['id'], group['links'])
+                else:
+                    self.topic_groups.add_group(group['tag'], group['importance_score'], group['links'])
+            # 模型沒有納入任何分組的新聞也記下，下個週期不再重送
+            self.topic_groups.mark_seen(link for link in remaining_df['link'] if self.topic_groups.group_of(link) is None)
+
+        self.topic_groups.save()
+        self.save_grouped_news(self.topic_groups.groups)
+        return self.topic_groups.groups
+
+    def save_grouped_news(self, news_groups: List[Dict]) -> None:
+        save_path = self.poster_dir / "grouped_news.csv"
+        data = []
+        for group in news_groups:
+            for link in group['links']:
+                data.append({
+                    "link": link,
+                    "tag": group['tag'],
+                    "importance_score": group['importance_score']
+                })
+        pd.DataFrame(data).to_csv(save_path, index=False, encoding='utf-8')
+        get_news_db().save_group_tags(self.run_time, news_groups)
+        get_news_db().put_artifact(self.run_time, 'grouped_news', save_path)
+        self.logger.info(f"已將分組新聞保存至 {save_path}")
+
     def load_summarize_prompt_template(self):
         prompt_path = Path("./prompt/summarize_group_news.txt")
         try:
@@ -188,124 +341,202 @@ class Poster:
             self.logger.error(f"載入摘要提示模板時出錯：{e}")
             raise
 
+    def summarize_group(self, client, template: str, group: Dict) -> Optional[NewsSummary]:
+        """為單一新聞組生成摘要，失敗時回傳 None"""
+        try:
+            self.logger.info(f"開始為標籤 '{group['tag']}' 的新聞組生成摘要")
+            group_contents = self.collect_group_contents(group)
+            
+            formatted_prompt = template.format(
+                group_tag=group['tag'],
+                news_contents=json.dumps(group_contents, ensure_ascii=False, indent=2)
+            )
+
+            response = get_llm_cache().chat_completion(
+                client,
+                "summarize_groups",
+                validate=lambda response: 'headline' in tool_arguments(response, "output_news_summary"),
+                model="gpt-4o-2024-08-06",
+                temperature=0,
+                messages=[
+                    {"role": "system", "content": "您是一位專業的新聞編輯，擅長總結和提取新聞組的關鍵信息。"},
+                    {"role": "user", "content": formatted_prompt}
+                ],
+                tools=[{
+                    "type": "function",
+                    "function": {
+                        "name": "output_news_summary",
+                        "description": "輸出新聞組的摘要和關鍵點",
+                        "parameters": {
+                            "type": "object",
+                            "properties": {
+                                "headline": {"type": "string", "description": "新聞組的標題"},
+                                "main_body": {"type": "string", "description": "新聞組的主要內容摘要"},
+                                "key_points": {"type": "array", "items": {"type": "string"}, "description": "新聞組的關鍵點列表"}
+                            },
+                            "required": ["headline", "main_body", "key_points"]
+                        }
+                    }
+                }]
+            )
+            log_prompt_usage("summarize_groups", formatted_prompt, response)
+
+            tool_call = response.choices[0].message.tool_calls[0]
+            if tool_call.function.name != "output_news_summary":
+                self.logger.warning("API 回應中出現意外的函數調用")
+                return None
+            result = json.loads(tool_call.function.arguments)
+            return NewsSummary(
+                tag=group['tag'],
+                importance_score=group['importance_score'],
+                headline=result['headline'],
+                main_body=result['main_body'],
+                key_points=result['key_points']
+            )
+        except Exception as e:
+            self.logger.error(f"為標籤 '{group['tag']}' 的新聞組生成摘要時發生錯誤: {e}")
+            return None
+
     def summarize_news_groups(self):
         self.logger.info("開始為每個新聞組生成摘要")
         client = OpenAI()
-        summaries = []
+        template = self.load_summarize_prompt_template()  # 每個週期只讀取一次模板
+
+        pending = [group for group in self.valuable_news if self.topic_groups.needs_summary(group)]
+        # executor.map 依輸入順序回傳結果
+        with ThreadPoolExecutor(max_workers=self.max_inflight_group_summaries, thread_name_prefix="group_summary") as executor:
+            results = dict(zip(
+                [group['id'] for group in pending],
+                executor.map(lambda group: self.summarize_group(client, template, group), pending),
+            ))
 
+        summaries = []
+        counts = {'summarized': 0, 'reused': 0, 'stale': 0, 'dropped': 0}
+        dropped_ids = []
         for group in self.valuable_news:
-            try:
-                self.logger.info(f"開始為標籤 '{group['tag']}' 的新聞組生成摘要")
-                group_contents = self.collect_group_contents(group)
-                
-                formatted_prompt = self.load_summarize_prompt_template().format(
-                    group_tag=group['tag'],
-                    news_contents=json.dumps(group_contents, ensure_ascii=False, indent=2)
-                )
-
-                response = client.chat.completions.create(
-                    model="gpt-4o-2024-08-06",
-                    temperature=0,
-                    messages=[
-                        {"role": "system", "content": "您是一位專業的新聞編輯，擅長總結和提取新聞組的關鍵信息。"},
-                        {"role": "user", "content": formatted_prompt}
-                    ],
-                    tools=[{
-                        "type": "function",
-                        "function": {
-                            "name": "output_news_summary",
-                            "description": "輸出新聞組的摘要和關鍵點",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "headline": {"type": "string", "description": "新聞組的標題"},
-                                    "main_body": {"type": "string", "description": "新聞組的主要內容摘要"},
-                                    "key_points": {"type": "array", "items": {"type": "string"}, "description": "新聞組的關鍵點列表"}
-                                },
-                                "required": ["headline", "main_body", "key_points"]
-                            }
-                        }
-                    }]
-                )
-
-                tool_call = response.choices[0].message.tool_calls[0]
-                if tool_call.function.name == "output_news_summary":
-                    result = json.loads(tool_call.function.arguments)
-                    summary = NewsSummary(
-                        tag=group['tag'],
-                        importance_score=group['importance_score'],
-                        headline=result['headline'],
-                        main_body=result['main_body'],
-                        key_points=result['key_points']
-                    )
-                    summaries.append(summary)
-                else:
-                    self.logger.warning("API 回應中出現意外的函數調用")
+            if group['id'] not in results:
+                # 成員沒有變動，沿用上次的摘要
+                summaries.append(NewsSummary(**{**group['summary'], 'tag': group['tag'], 'importance_score': group['importance_score']}))
+                counts['reused'] += 1
+            elif results[group['id']] is not None:
+                summaries.append(results[group['id']])
+                self.topic_groups.set_summary(group['id'], results[group['id']].dict())
+                counts['summarized'] += 1
+            elif group.get('summary') is not None:
+                # 重新摘要失敗，暫時沿用成員變動前的摘要，下個週期再試
+                summaries.append(NewsSummary(**{**group['summary'], 'tag': group['tag'], 'importance_score': group['importance_score']}))
+                counts['stale'] += 1
+            else:
+                counts['dropped'] += 1
+                dropped_ids.append(group['id'])
 
-            except Exception as e:
-                self.logger.error(f"為標籤 '{group['tag']}' 的新聞組生成摘要時發生錯誤: {e}")
+        self.topic_groups.save()
+        if dropped_ids:
+            self.logger.warning(f"{len(dropped_ids)} 個新聞組摘要失敗且沒有先前的摘要，本週期略過：{', '.join(map(str, dropped_ids))}")
+        self.logger.info(
+            f"新聞組摘要完成：重新摘要 {counts['summarized']} 組，沿用 {counts['reused']} 組，"
+            f"失敗後沿用舊摘要 {counts['stale']} 組，失敗略過 {counts['dropped']} 組"
+        )
+        if self.article_index is not None:
+            self.article_index.log_stats()
 
         # 直接在這裡保存摘要
         save_path = self.poster_dir / "summaries.json"
         with open(save_path, 'w', encoding='utf-8') as f:
             json.dump([summary.dict() for summary in summaries], f, ensure_ascii=False, indent=2)
+        get_news_db().put_artifact(self.run_time, 'summaries', save_path)
         self.logger.info(f"已將新聞摘要保存至 {save_path}")
 
         return summaries
 
     def collect_group_contents(self, group: Dict) -> List[Dict[str, str]]:
         group_contents = []
+        article_budget = self.group_token_budget // max(1, len(group['links']))
         for link in group['links']:
             try:
-                # 從 combined_df 中找到對應的行
-                row = self.combined_df[self.combined_df['link'] == link].iloc[0]
-                source = row['source']
-                feed = row['feed']
-                
-                # 使用 get_safe_filename 生成安全的文件名
-                safe_filename = get_safe_filename(link)
-                # 構建內容文件的路徑
-                content_file = get_file_path(self.news_content_dir, source, feed, safe_filename)
-                
-                if content_file.exists():
-                    with open(content_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
+                # 先前週期加入分組、已不在本週期訂閱源中的新聞沒有對應的列，仍可從內容庫讀取
+                row = self.article_index.get_row(link) or {}
+                content = self.article_index.get_content(link)
+
+                if content is not None:
                     group_contents.append({
                         "link": link,
-                        "source": source,
-                        "feed": feed,
-                        "content": content
+                        "source": row.get('source', ''),
+                        "feed": row.get('feed', ''),
+                        "content": self.cleaner.prepare(link, content, article_budget)
                     })
                 else:
-                    self.logger.warning(f"找不到內容文件: {content_file}")
+                    self.logger.warning(f"找不到新聞內容: {link}")
             except Exception as e:
                 self.logger.error(f"處理鏈接 {link} 時發生錯誤: {e}")
         
         return group_contents
 
+    def process_feed(self, key: str, ai_news: AINews) -> bool:
+        """處理單一訂閱源，失敗時只記錄錯誤，不影響其他訂閱源"""
+        try:
+            self.logger.info(f"Processing {key}")
+            ai_news.run()
+            self.last_processed_time[key] = time.time()
+            return True
+        except Exception as e:
+            self.logger.error(f"Error processing {key}: {e}")
+            return False
+
+    def ingest_feeds(self):
+        """以有上限的執行緒池同時處理所有訂閱源的解析、爬取與摘要"""
+        start_time = time.time()
+        workers = min(self.max_workers, len(self.ai_news_instances)) or 1
+        self.logger.info(f"開始處理 {len(self.ai_news_instances)} 個訂閱源，並行上限 {workers}")
+
+        succeeded = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="feed") as executor:
+            futures = {
+                executor.submit(self.process_feed, key, ai_news): key
+                for key, ai_news in self.ai_news_instances.items()
+            }
+            for future in as_completed(futures):
+                if future.result():
+                    succeeded += 1
+
+        unchanged = sum(1 for ai_news in self.ai_news_instances.values() if ai_news.not_modified)
+        self.logger.info(
+            f"訂閱源處理完成：成功 {succeeded}/{len(self.ai_news_instances)}，"
+            f"未變更 (304) {unchanged} 個，耗時 {time.time() - start_time:.1f} 秒"
+        )
+        if self.use_proxy:
+            get_proxy_pool().log_health()
+
     def run(self):
         self.logger.info("開始新聞處理週期")
-        for key, ai_news in self.ai_news_instances.items():
-            try:
-                self.logger.info(f"Processing {key}")
-                ai_news.run()
-                self.last_processed_time[key] = time.time()
-            except Exception as e:
-                self.logger.error(f"Error processing {key}: {e}")
+        self.ingest_feeds()
 
         combined_df = self.concat_news_data()
         if combined_df is not None:
-            self.valuable_news = self.group_and_tag_news(combined_df)
-            self.logger.info(f"將新聞分組為 {len(self.valuable_news)} 個主題")
+            self.valuable_news = self.update_topic_groups(combined_df)
+            self.logger.info(f"目前共有 {len(self.valuable_news)} 個主題分組")
             
             self.summarize_news_groups()
         else:
             self.logger.warning("沒有新聞數據可處理")
-        
+
+        get_llm_cache().log_stats()
         self.logger.info("完成新聞處理週期")
 
 def main():
-    poster = Poster()
+    parser = argparse.ArgumentParser(description="定期處理並發布新聞")
+    parser.add_argument('-w', '--max-workers', type=int, default=5, help='同時處理的訂閱源數量上限')
+    parser.add_argument('-p', '--use-proxy', action='store_true', help='Use proxy for fetching news content')
+    parser.add_argument('--no-cache', action='store_true', help='略過 LLM 回應快取')
+    parser.add_argument('--shard-size', type=int, default=150, help='每次分組呼叫最多送出的候選群組數')
+    parser.add_argument('--group-parallelism', type=int, default=4, help='同時進行的分片分組請求上限')
+    parser.add_argument('--max-inflight-summaries', type=int, default=4, help='同時進行的新聞組摘要請求上限')
+    args = parser.parse_args()
+    get_llm_cache().bypass = get_llm_cache().bypass or args.no_cache
+
+    poster = Poster(max_workers=args.max_workers, use_proxy=args.use_proxy,
+                    group_shard_size=args.shard_size, group_parallelism=args.group_parallelism,
+                    max_inflight_group_summaries=args.max_inflight_summaries)
     poster.initialize_ai_news_instances()
     poster.run()
     # schedule.every(5).minutes.do(poster.run)
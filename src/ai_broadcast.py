@@ -1,20 +1,29 @@
 import os
+import json
 import pandas as pd
+from datetime import datetime
 from dotenv import load_dotenv
 import openai
 from pathlib import Path
 import argparse
+import threading
 import yaml
+from src.ai_rewrite import AIRewrite
+from src.audio_cache import get_audio_cache
+from src.tts_engine import TTSEngine, DEFAULT_CHUNK_CHARS
 
 class AIBroadcast:
-    def __init__(self, source, feed_name, voice, force_regenerate=False):
+    def __init__(self, source, feed_name, voice, force_regenerate=False, max_workers=4,
+                 max_chars=DEFAULT_CHUNK_CHARS, bulletin=False):
         self.source = source
         self.feed_name = feed_name
         self.voice = voice
         self.force_regenerate = force_regenerate
+        self.bulletin = bulletin
 
         # 路徑相關參數
         self.data_dir = Path("./data")
+        self.news_chosen_dir = self.data_dir / "news_chosen"
         self.news_rewrite_dir = self.data_dir / "news_rewrite"
         self.news_broadcast_dir = self.data_dir / "news_broadcast"
         self.config_dir = Path("./src/config")
@@ -27,14 +36,112 @@ class AIBroadcast:
         openai.api_key = os.getenv("OPENAI_API_KEY")
         if openai.api_key is None:
             raise ValueError("OpenAI API key is not set in .env file.")
+        # 長腳本依句子切段後同時合成，再串接成單一 MP3；--force 時不讀語音快取，但仍更新快取
+        self.tts_engine = TTSEngine(openai, voice, model="tts-1", max_chars=max_chars, max_workers=max_workers,
+                                    audio_cache=get_audio_cache(), refresh_cache=force_regenerate)
+        self.manifest_path = self.output_folder / ".manifest.json"
+        self.manifest_lock = threading.Lock()
 
     def create_speech(self, text, output_file):
-        response = openai.audio.speech.create(
-            model="tts-1",
-            voice=self.voice,
-            input=text
-        )
-        response.stream_to_file(output_file)
+        self.tts_engine.synthesize_to_file(text, Path(output_file))
+
+    def load_chosen(self):
+        """今日選出的新聞（含 link 與 title），依選擇順序排列；沒有選擇結果時回傳 None"""
+        chosen_path = self.news_chosen_dir / f"{self.source}_{self.feed_name}.csv"
+        if not chosen_path.exists():
+            return None
+        return pd.read_csv(chosen_path).to_dict(orient='records')
+
+    def read_script(self, file):
+        with open(self.input_folder / file, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def load_scripts(self, chosen=None):
+        """
+        依播出順序讀取改寫後的腳本。
+
+        只讀取今日選出的新聞（chosen，未指定時讀取 news_chosen 中的 CSV），依選擇順序排列，
+        改寫資料夾中較早留下的其他腳本不列入。沒有選擇結果時才讀取全部腳本，
+        順序與標題取自改寫時寫下的 .manifest.json，沒有紀錄的腳本排在最後並以檔名為標題。
+        """
+        if chosen is None:
+            chosen = self.load_chosen()
+        if chosen is not None:
+            scripts = []
+            for row in chosen:
+                file = AIRewrite.get_safe_filename(row['link'])
+                if not (self.input_folder / file).exists():
+                    print(f"找不到改寫腳本，略過: {self.input_folder / file}")
+                    continue
+                scripts.append({'file': file, 'title': row['title'], 'text': self.read_script(file)})
+            return scripts
+
+        manifest_path = self.input_folder / ".manifest.json"
+        manifest = {}
+        if manifest_path.exists():
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        files = sorted(file for file in os.listdir(self.input_folder) if file.endswith(".txt"))
+        files.sort(key=lambda file: manifest.get(file, {}).get('position', len(files)))
+        return [{'file': file, 'title': manifest.get(file, {}).get('title') or file[:-4], 'text': self.read_script(file)}
+                for file in files]
+
+    def load_manifest(self):
+        """輸出檔名對應到生成時的腳本雜湊，腳本改變後雜湊不同即重新生成"""
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"讀取音頻紀錄失敗，將重新建立: {self.manifest_path} - {e}")
+            return {}
+
+    def save_manifest(self, manifest):
+        with self.manifest_lock:
+            tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+
+    def is_current(self, output_file, script_key, manifest):
+        return not self.force_regenerate and output_file.exists() and manifest.get(output_file.name) == script_key
+
+    def run_bulletin(self, scripts, manifest):
+        if not scripts:
+            print(f"沒有今日選出新聞的腳本，不生成每日快報: {self.source}_{self.feed_name}")
+            return
+        output_file = self.output_folder / f"bulletin_{datetime.now().strftime('%Y%m%d')}_{self.voice}.mp3"
+        script_key = self.tts_engine.script_key('\n'.join(f"{script['title']}\n{script['text']}" for script in scripts))
+        if self.is_current(output_file, script_key, manifest):
+            print(f"每日快報內容未變更，跳過: {output_file}")
+            return
+        chapters = self.tts_engine.synthesize_bulletin(scripts, output_file)
+        manifest[output_file.name] = script_key
+        self.save_manifest(manifest)
+        print(f"已生成每日快報: {output_file}（{len(chapters)} 章）")
+        for chapter in chapters:
+            minutes, seconds = divmod(int(chapter['start']), 60)
+            print(f"  {minutes:02d}:{seconds:02d} {chapter['title']}")
+
+    def broadcast_script(self, script, manifest):
+        """合成單一腳本的音頻，腳本未變更時跳過；回傳是否實際生成"""
+        input_file = self.input_folder / script['file']
+        url_safe_link = script['file'][:-4]
+        output_file = self.output_folder / f"{url_safe_link}_{self.voice}.mp3"
+        script_key = self.tts_engine.script_key(script['text'])
+
+        print(f"處理檔案: {input_file}")
+        if self.is_current(output_file, script_key, manifest):
+            print(f"腳本未變更，跳過: {output_file}")
+            return False
+        self.create_speech(script['text'], str(output_file))
+        with self.manifest_lock:
+            manifest[output_file.name] = script_key
+        self.save_manifest(manifest)
+        print(f"已生成音頻: {output_file}")
+        return True
 
     def run(self):
         self.output_folder.mkdir(parents=True, exist_ok=True)
@@ -42,21 +149,14 @@ class AIBroadcast:
         print(f"輸入資料夾: {self.input_folder}")
         print(f"輸出資料夾: {self.output_folder}")
 
-        for file in os.listdir(self.input_folder):
-            if file.endswith(".txt"):
-                input_file = self.input_folder / file
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                
-                url_safe_link = file[:-4]
-                output_file = self.output_folder / f"{url_safe_link}_{self.voice}.mp3"
-                
-                print(f"處理檔案: {input_file}")
-                if output_file.exists() and not self.force_regenerate:
-                    print(f"音頻文件已存在，跳過: {output_file}")
-                else:
-                    self.create_speech(text, str(output_file))
-                    print(f"已生成音頻: {output_file}")
+        scripts = self.load_scripts()
+        manifest = self.load_manifest()
+        if self.bulletin:
+            self.run_bulletin(scripts, manifest)
+        else:
+            for script in scripts:
+                self.broadcast_script(script, manifest)
+        get_audio_cache().log_stats()
 
 def load_rss_config():
     ai_broadcast = AIBroadcast("", "", "")  # 臨時實例來訪問路徑
@@ -119,7 +219,10 @@ def main():
     parser.add_argument('-s', '--source', help='新聞來源')
     parser.add_argument('-f', '--feed', help='Feed 名稱')
     parser.add_argument('-v', '--voice', choices=['alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer'], help='OpenAI TTS 語音選項')
-    parser.add_argument('--force', action='store_true', help='強制重新生成所有音頻')
+    parser.add_argument('--force', action='store_true', help='強制重新生成所有音頻，不讀取語音快取')
+    parser.add_argument('--bulletin', action='store_true', help='把所有腳本合成為單一集每日快報，附章節索引')
+    parser.add_argument('--max-workers', type=int, default=4, help='同時合成的片段數量上限')
+    parser.add_argument('--max-chars', type=int, default=DEFAULT_CHUNK_CHARS, help='每個合成片段的字數上限')
 
     args = parser.parse_args()
     rss_config = load_rss_config()
@@ -130,7 +233,8 @@ def main():
     if not args.voice:
         args.voice = select_voice()
 
-    ai_broadcast = AIBroadcast(args.source, args.feed, args.voice, args.force)
+    ai_broadcast = AIBroadcast(args.source, args.feed, args.voice, args.force, max_workers=args.max_workers,
+                               max_chars=args.max_chars, bulletin=args.bulletin)
     ai_broadcast.run()
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Dict
+from typing import List, Dict, Optional
 import openai
 import os
 import pandas as pd
@@ -7,21 +7,27 @@ from dotenv import load_dotenv
 from pydantic import BaseModel
 import argparse
 import json
+from src.llm_cache import get_llm_cache
+from src.news_db import ARTICLE_COLUMNS, get_news_db
+from src.pre_ranker import PreRanker, load_pre_ranker_config
+from src.prompt_compiler import CompiledNewsList, log_prompt_usage
+from utils.file_utils import atomic_write_csv
 
 # 定義 Pydantic 模型來結構化輸出
 class ChosenNewsItem(BaseModel):
-    link: str
-    title: str
+    id: str
     ai_reason: str
 
 class ChosenNewsParameters(BaseModel):
     chosen_news: List[ChosenNewsItem]
 
 class AIChose:
-    def __init__(self, source: str, feed_name: str, n: int):
+    def __init__(self, source: str, feed_name: str, n: int, top_k: int = None):
         self.source = source
         self.feed_name = feed_name
         self.n = n
+        # 送進 LLM 前先以本地規則篩出前 top_k 則候選，None 時使用設定檔的值，0 為停用
+        self.pre_ranker = PreRanker(load_pre_ranker_config(), top_k)
         
         # 路徑相關參數
         self.data_dir = "./data"
@@ -43,17 +49,29 @@ class AIChose:
             return f.read()
 
     def load_news(self) -> pd.DataFrame:
+        # 資料庫還沒有此訂閱源時讀取舊版 CSV
+        news_db = get_news_db()
+        if news_db.has_feed(self.source, self.feed_name):
+            return news_db.read_articles(self.source, self.feed_name, columns=ARTICLE_COLUMNS)
         return pd.read_csv(self.input_filename)
 
+    @staticmethod
+    def compile_news(news_df: pd.DataFrame) -> CompiledNewsList:
+        # 提示只需要 ai_title 與 ai_summary，URL 以短 ID 取代
+        return CompiledNewsList(news_df, ['ai_title', 'ai_summary'])
+
     def choose_important_news(self, news_df: pd.DataFrame) -> List[Dict[str, any]]:
         total_news = len(news_df)
-        news_list = news_df.to_dict(orient='records')
+        news_list = self.compile_news(news_df)
 
-        prompt = self.prompt_template.format(n=self.n, news_list=json.dumps(news_list, ensure_ascii=False, indent=2), total_news=total_news)
+        prompt = self.prompt_template.format(n=self.n, news_list=news_list.render(), total_news=total_news)
 
         client = openai.OpenAI()
 
-        response = client.chat.completions.create(
+        response = get_llm_cache().chat_completion(
+            client,
+            "choose_news",
+            validate=lambda response: 'chosen_news' in json.loads(response.choices[0].message.tool_calls[0].function.arguments),
             model="gpt-4o-2024-08-06",
             temperature=0,
             messages=[
@@ -64,29 +82,39 @@ class AIChose:
                 openai.pydantic_function_tool(
                     ChosenNewsParameters, 
                     name="output_chosen_news", 
-                    description="Select the most important news with original url links from the original list and the reasons they are important."
+                    description="Select the most important news by their ids from the original list and the reasons they are important."
                 )
             ]
         )
+        log_prompt_usage("choose_news", prompt, response)
 
         tool_call = response.choices[0].message.tool_calls[0]
         if tool_call.function.name == "output_chosen_news":
-            chosen_news = json.loads(tool_call.function.arguments)['chosen_news']
-            print("API returned chosen_news:", chosen_news)
+            chosen_items = json.loads(tool_call.function.arguments)['chosen_news']
+            print("API returned chosen_news:", chosen_items)
+            # 把 ID 換回原本的 link，無法對應的項目由 resolve 略過
+            chosen_news = []
+            for item in chosen_items:
+                links = news_list.resolve([item['id']])
+                if links:
+                    chosen_news.append({'link': links[0], 'ai_reason': item['ai_reason']})
             return chosen_news
         else:
             print("未找到預期的函數調用")
             return []
 
     def save_to_csv(self, data_frame: pd.DataFrame):
-        os.makedirs(os.path.dirname(self.output_filename), exist_ok=True)
-        data_frame.to_csv(self.output_filename, index=False)
+        atomic_write_csv(data_frame, self.output_filename)
 
-    def run(self):
+    def run(self) -> Optional[pd.DataFrame]:
         news_df = self.load_news()
         print(f"載入了 {len(news_df)} 條新聞")
 
-        chosen_news = self.choose_important_news(news_df)
+        candidates_df = self.pre_ranker.rank(news_df, self.source, min_keep=self.n)
+        self.pre_ranker.log_token_savings(self.compile_news(news_df).render(), self.compile_news(candidates_df).render())
+        print(f"預排序後保留 {len(candidates_df)} 條候選新聞")
+
+        chosen_news = self.choose_important_news(candidates_df)
         print(f"選擇了 {len(chosen_news)} 條重要新聞")
 
         if chosen_news:
@@ -98,7 +126,7 @@ class AIChose:
 
             if chosen_df.empty:
                 print("選擇的新聞DataFrame為空，請檢查連結是否正確")
-                return
+                return None
 
             # 確保 ai_reason 欄位存在
             if 'ai_reason' not in chosen_df.columns:
@@ -107,10 +135,13 @@ class AIChose:
             for item in chosen_news:
                 chosen_df.loc[chosen_df['link'] == item['link'], 'ai_reason'] = item['ai_reason']
 
+            get_news_db().set_chosen(self.source, self.feed_name, dict(zip(chosen_df['link'], chosen_df['ai_reason'])))
             self.save_to_csv(chosen_df)
             print(f"選擇了 {len(chosen_news)} 條重要新聞，儲存至 {self.output_filename}")
+            return chosen_df
         else:
             print("無法選擇重要新聞，chosen_news 為空")
+            return None
 
 # 選擇 CSV 文件
 def get_news_files():
@@ -148,6 +179,7 @@ def main():
     parser = argparse.ArgumentParser(description="選擇重要新聞")
     parser.add_argument('-f', '--file', help='新聞 CSV 文件名稱')
     parser.add_argument('-n', '--num_chosen', type=int, help='選擇的重要新聞數量')
+    parser.add_argument('-k', '--top_k', type=int, help='預排序後送進模型的候選數量（預設讀取 src/config/pre_ranker.yaml，0 為停用）')
     args = parser.parse_args()
 
     if not args.file:
@@ -158,8 +190,9 @@ def main():
 
     source, feed_name = args.file.replace('.csv', '').split('_', 1)
 
-    ai_chose = AIChose(source, feed_name, args.num_chosen)
+    ai_chose = AIChose(source, feed_name, args.num_chosen, args.top_k)
     ai_chose.run()
+    get_llm_cache().log_stats()
     print(f"選擇了 {args.num_chosen} 條重要新聞，結果保存在 {ai_chose.output_filename}")
 
 if __name__ == "__main__":
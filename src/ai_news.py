@@ -11,9 +11,20 @@ import json
 import yaml
 from pathlib import Path
 from src.config.log_config import setup_logger
+from src.feed_state import FeedState
+from src.summary_journal import SummaryJournal
+from src.news_db import get_news_db
+from src.news_archive import NewsArchive
+from src.article_store import ArticleStore, get_content_hash
+from src.content_store import get_content_store, read_content
+from src.content_cleaner import ContentCleaner
+from src.llm_cache import get_llm_cache
+from src.fetch_engine import get_fetch_engine
+from src.proxy_pool import get_proxy_pool
+from utils.file_utils import atomic_write_csv
 import time
-from ratelimit import limits, sleep_and_retry
-import random
+import calendar
+from concurrent.futures import ThreadPoolExecutor
 
 # 初始化日誌記錄器
 logger = setup_logger(__name__)
@@ -22,8 +33,60 @@ class AINewsException(Exception):
     """自定義 AINews 異常類"""
     pass
 
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_SYSTEM_PROMPT = "你是一位專業的記者，你的目標是以繁體中文總結一個英文報導，包含一個繁體中文標題及繁體文總結，用戶透過你的總結能很明確的知道這篇新聞探討的議題及重點是什麼，來決定他們要不要閱讀完整的內文。"
+SUMMARY_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "output_title_and_summary",
+            "description": "產生繁體中文標題及總結後，將它們做為參數呼叫此function。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "The chinese title of news."
+                    },
+                    "summary": {
+                        "type": "string",
+                        "description": "The chinese summary of news."
+                    }
+                },
+                "required": ["title", "summary"],
+            },
+        },
+    },
+]
+
+def build_summary_request(title: str, news_content: str) -> Dict:
+    """單篇新聞摘要的 chat completion 參數，同步呼叫與 Batch API 共用"""
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"title: {title}, content: {news_content}"}
+        ],
+        "tools": SUMMARY_TOOLS,
+        "tool_choice": "auto"
+    }
+
+def parse_summary_message(response_message) -> tuple[str, str]:
+    tool_calls = response_message.tool_calls
+    if tool_calls:
+        for tool_call in tool_calls:
+            function_args = json.loads(tool_call.function.arguments)
+            ai_title = function_args.get("title")
+            ai_summary = function_args.get("summary")
+            return ai_title, ai_summary
+    raise AINewsException("No valid response from AI model")
+
+def is_valid_summary_response(response) -> bool:
+    ai_title, ai_summary = parse_summary_message(response.choices[0].message)
+    return bool(ai_title) and bool(ai_summary)
+
 class AINews:
-    def __init__(self, rss_feed_url: str, source: str, feed_name: str, re_fetch: bool = False, re_summarize: bool = False, use_proxy: bool = False):
+    def __init__(self, rss_feed_url: str, source: str, feed_name: str, re_fetch: bool = False, re_summarize: bool = False, use_proxy: bool = False, summary_token_budget: int = 6000, max_inflight_summaries: int = 4, batch_mode: bool = False, export_csv: bool = True):
         self.rss_feed_url = rss_feed_url
         self.source = source
         self.feed_name = feed_name
@@ -31,57 +94,52 @@ class AINews:
         self.news_dir = self.data_dir / "news"
         self.news_content_dir = self.data_dir / "news_content"
         self.filename = self.news_dir / f"{source}_{feed_name}.csv"
-        self.content_folder = self.news_content_dir / f"{source}_{feed_name}"
+        self.content_folder = self.news_content_dir / f"{source}_{feed_name}"  # 舊版單檔內容，僅供讀取遷移
         self.config_path = Path("./src/config/rss_feed.yaml")
         self.re_fetch = re_fetch
         self.re_summarize = re_summarize
         self.use_proxy = use_proxy
-        self.proxies = [
-            {'http': '138.197.102.119:80'},
-            {'http': '160.248.189.95:3128'},
-            {'http': '160.248.93.134:3128'},
-            {'http': '103.216.50.11:8080'},
-            {'http': '124.236.25.252:8080'},
-            {'http': '38.242.199.124:8089'},
-            {'http': '160.248.93.158:3128'},
-            {'http': '116.169.54.253:8080'},
-            {'http': '160.248.186.67:3128'},
-            {'http': '190.186.18.161:999'},
-        ]
+        self.feed_state = FeedState(source, feed_name)
+        self.journal = SummaryJournal(source, feed_name)  # 逐則記錄摘要，中斷後可接續
+        self.content_store = get_content_store()
+        self.article_store = ArticleStore(self.content_store)
+        self.cleaner = ContentCleaner(self.content_store)
+        self.summary_token_budget = summary_token_budget  # 每次摘要呼叫送出的內容 token 上限
+        self.max_inflight_summaries = max(1, max_inflight_summaries)  # 同時進行的摘要請求上限
+        self.batch_mode = batch_mode  # 只爬取不摘要，待摘要的新聞交給 src.batch_summarize 以 Batch API 處理
+        self.news_db = get_news_db()
+        self.archive = NewsArchive()
+        self.export_csv = export_csv  # 除了資料庫外，另外匯出舊版的訂閱源 CSV
+        self.fetch_engine = get_fetch_engine()
+        self.not_modified = False  # 最近一次 run 是否因 304 而略過
+        self.pending_validators = None
+        self.pending_watermark = None
+        self.proxy_pool = get_proxy_pool() if use_proxy else None
         load_dotenv()
         openai.api_key = os.environ.get('OPENAI_API_KEY')
         self.client = openai.OpenAI()
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "output_title_and_summary",
-                    "description": "產生繁體中文標題及總結後，將它們做為參數呼叫此function。",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "title": {
-                                "type": "string",
-                                "description": "The chinese title of news."
-                            },
-                            "summary": {
-                                "type": "string",
-                                "description": "The chinese summary of news."
-                            }
-                        },
-                        "required": ["title", "summary"],
-                    },
-                },
-            },
-        ]
+        self.llm_cache = get_llm_cache()
+        self.tools = SUMMARY_TOOLS
     
     def parse_feed(self) -> Dict:
         try:
-            feed = feedparser.parse(self.rss_feed_url)
+            # 只有在已有輸出且不是強制重跑時才帶上快取驗證值，避免 304 導致永遠沒有資料
+            use_validators = not (self.re_fetch or self.re_summarize) and self.has_saved_data()
+            feed = feedparser.parse(
+                self.rss_feed_url,
+                etag=self.feed_state.etag if use_validators else None,
+                modified=self.feed_state.modified if use_validators else None,
+            )
+            if feed.get('status') == 304:
+                return {"not_modified": True, "entries": []}
             if feed.bozo:
                 raise AINewsException(f"Error parsing the feed: {feed.bozo_exception}")
 
+            # 驗證值在整個處理流程成功後才寫入，避免中途失敗導致下次被 304 略過
+            self.pending_validators = (feed.get('etag'), feed.get('modified'))
+
             parsed_feed = {
+                "not_modified": False,
                 "feed_title": feed.feed.get('title', 'No title'),
                 "feed_subtitle": feed.feed.get('subtitle', 'N/A'),
                 "feed_link": feed.feed.get('link', 'No link'),
@@ -90,11 +148,17 @@ class AINews:
             }
 
             for entry in feed.entries:
+                published_parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+                updated_parsed = entry.get('updated_parsed')
+                link = entry.get('link', 'No link')
                 parsed_feed['entries'].append({
                     "title": entry.get('title', 'No title'),
                     "summary": entry.get('summary', entry.get('description', 'No summary available')),
-                    "link": entry.get('link', 'No link'),
-                    "published": entry.get('published', entry.get('updated', 'No publish date'))
+                    "link": link,
+                    "guid": entry.get('id', link),
+                    "published": entry.get('published', entry.get('updated', 'No publish date')),
+                    "published_ts": calendar.timegm(published_parsed) if published_parsed else None,
+                    "updated_ts": calendar.timegm(updated_parsed) if updated_parsed else None
                 })
 
             return parsed_feed
@@ -102,66 +166,128 @@ class AINews:
             logger.error(f"Failed to parse feed: {e}")
             raise AINewsException(f"Failed to parse feed: {e}")
 
-    @sleep_and_retry
-    @limits(calls=20, period=60)  # 每分鐘 20 次請求
-    def fetch_single_news(self, entry: Dict) -> None:
-        safe_filename = self.get_safe_filename(entry['link'])
-        file_path = self.content_folder / safe_filename
-
-        if not self.re_fetch and file_path.exists():
-            logger.info(f"跳過：{entry['title']} - 檔案已存在。")
-            return
+    def fetch_single_news(self, entry: Dict, force: bool = False) -> bool:
+        """爬取單篇新聞內容並寫入內容庫，回傳是否實際發出了網路請求"""
+        # 內容庫以正規化 URL 為鍵，其他訂閱源已爬取過的同一篇文章會直接命中
+        if not (self.re_fetch or force) and self.has_content(entry['link']):
+            logger.info(f"跳過：{entry['title']} - 內容已存在。")
+            return False
 
         jina_reader_url = f"https://r.jina.ai/{entry['link']}"
         
         if self.use_proxy:
-            for _ in range(len(self.proxies)):
-                proxy = random.choice(self.proxies)
+            response = None
+            for _ in range(self.proxy_pool.max_attempts):
+                proxy = self.proxy_pool.acquire()
+                if proxy is None:
+                    logger.warning("代理池中沒有可用的代理")
+                    break
                 try:
-                    response = requests.get(jina_reader_url, proxies={'http': proxy['http']}, timeout=100)
-                    response.raise_for_status()
+                    # 先取得限速 token 再計時，代理的延遲只計算實際的 HTTP 請求
+                    self.fetch_engine.acquire_tokens(jina_reader_url, upstream_url=entry['link'])
+                    start_time = time.monotonic()
+                    try:
+                        response = self.fetch_engine.send(
+                            jina_reader_url,
+                            proxies={'http': proxy.address, 'https': proxy.address},
+                            timeout=self.proxy_pool.timeout,
+                        )
+                    except requests.RequestException as e:
+                        # 連線錯誤、連線後停滯的 ReadTimeout 等送出請求時的錯誤都算在代理上，換下一個代理重試
+                        self.proxy_pool.record_failure(proxy)
+                        logger.warning(f"使用代理 {proxy.address} 失敗：{e}")
+                        continue
+                    self.proxy_pool.record_success(proxy, time.monotonic() - start_time)
                     break
-                except requests.RequestException as e:
-                    logger.warning(f"使用代理 {proxy['http']} 失敗：{e}")
-                    continue
-            else:
+                finally:
+                    # 任何離開路徑都要結束探測，否則半開的代理不會再被挑中
+                    self.proxy_pool.release(proxy)
+            if response is None:
                 logger.error(f"所有代理都失敗，無法爬取：{entry['title']}")
-                return
-        else:
+                return True
             try:
-                response = requests.get(jina_reader_url, timeout=100)
+                # 上游回應錯誤狀態碼時代理本身是正常的，算作這篇文章失敗，不換代理重試
                 response.raise_for_status()
+            except requests.HTTPError as e:
+                logger.error(f"爬取內容失敗：{entry['title']} - URL：{entry['link']} - 錯誤：{e}")
+                return True
+        else:
+            try:
+                response = self.fetch_engine.get(jina_reader_url, upstream_url=entry['link'])
             except requests.RequestException as e:
                 logger.error(f"爬取內容失敗：{entry['title']} - URL：{entry['link']} - 錯誤：{e}")
-                return
+                return True
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
+        self.article_store.put_content(entry['link'], response.text)
         logger.info(f"已爬取：{entry['title']} - 發布時間：{entry['published']} - URL：{entry['link']} - 狀態：{response.status_code}")
+        return True
 
     def fetch_news_content(self, entries: List[Dict]) -> None:
-        self.content_folder.mkdir(parents=True, exist_ok=True)
-
+        pending = []
         for entry in entries:
-            safe_filename = self.get_safe_filename(entry['link'])
-            file_path = self.content_folder / safe_filename
-
-            if not self.re_fetch and file_path.exists():
-                logger.info(f"跳過：{entry['title']} - 檔案已存在。")
+            # 發布時間往前推進的新聞需要重新爬取
+            if not (self.re_fetch or entry.get('is_updated', False)) and self.has_content(entry['link']):
+                logger.info(f"跳過：{entry['title']} - 內容已存在。")
                 continue
+            pending.append(entry)
+
+        # 由共用的爬取引擎並行處理，限速依上游主機各自計算
+        results = self.fetch_engine.map(
+            lambda entry: self.fetch_single_news(entry, force=bool(entry.get('is_updated', False))),
+            pending,
+            url_of=lambda entry: entry['link'],
+        )
+        if pending:
+            logger.info(f"實際爬取 {sum(1 for fetched in results if fetched)}/{len(pending)} 篇")
+        if self.use_proxy:
+            self.proxy_pool.log_health()
+
+    def has_saved_data(self) -> bool:
+        return self.news_db.has_feed(self.source, self.feed_name) or self.filename.exists()
 
-            self.fetch_single_news(entry)
-            time.sleep(3)  # 只有在實際爬取時才等待 3 秒
+    def load_existing(self) -> Optional[pd.DataFrame]:
+        """讀取先前的處理結果；資料庫還沒有此訂閱源時讀取舊版 CSV"""
+        if self.news_db.has_feed(self.source, self.feed_name):
+            return self.news_db.read_articles(self.source, self.feed_name, current_only=False)
+        if self.filename.exists():
+            return pd.read_csv(self.filename)
+        return None
+
+    def save_results(self, data_frame: pd.DataFrame) -> None:
+        try:
+            self.news_db.save_feed(self.source, self.feed_name, data_frame)
+            logger.info(f"Saved {len(data_frame)} entries to news database: {self.source}_{self.feed_name}")
+        except Exception as e:
+            logger.error(f"Failed to save to news database: {e}")
+            raise AINewsException(f"Failed to save to news database: {e}")
+        if self.export_csv:
+            self.save_to_csv(data_frame)
+
+    def archive_processed(self, data_frame: pd.DataFrame) -> None:
+        """把本次摘要有變動的新聞附加到 Parquet 封存，失敗時不影響主流程"""
+        try:
+            self.archive.append(self.source, self.feed_name, data_frame)
+        except Exception as e:
+            logger.warning(f"封存新聞失敗：{e}")
 
     def save_to_csv(self, data_frame: pd.DataFrame) -> None:
         try:
             self.filename.parent.mkdir(parents=True, exist_ok=True)
-            data_frame.to_csv(self.filename, index=False, encoding='utf-8-sig')
+            atomic_write_csv(data_frame, self.filename, encoding='utf-8-sig')
             logger.info(f"Saved {len(data_frame)} entries to {self.filename}")
         except Exception as e:
             logger.error(f"Failed to save CSV: {e}")
             raise AINewsException(f"Failed to save CSV: {e}")
 
+    def legacy_content_file(self, url: str) -> Path:
+        return self.content_folder / self.get_safe_filename(url)
+
+    def has_content(self, url: str) -> bool:
+        return self.content_store.exists(url) or self.legacy_content_file(url).exists()
+
+    def get_content(self, url: str) -> Optional[str]:
+        return read_content(url, self.legacy_content_file(url))
+
     @staticmethod
     def get_safe_filename(url: str) -> str:
         url = url.split('://')[-1]
@@ -170,74 +296,214 @@ class AINews:
 
     def summarize_news(self, title: str, news_content: str) -> tuple[str, str]:
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "你是一位專業的記者，你的目標是以繁體中文總結一個英文報導，包含一個繁體中文標題及繁體文總結，用戶透過你的總結能很明確的知道這篇新聞探討的議題及重點是什麼，來決定他們要不要閱讀完整的內文。"},
-                    {"role": "user", "content": f"title: {title}, content: {news_content}"}
-                ],
-                tools=self.tools,
-                tool_choice="auto"
+            response = self.llm_cache.chat_completion(
+                self.client,
+                "summarize_news",
+                validate=is_valid_summary_response,
+                refresh=self.re_summarize,
+                **build_summary_request(title, news_content)
             )
-            response_message = response.choices[0].message
-            tool_calls = response_message.tool_calls
-            if tool_calls:
-                for tool_call in tool_calls:
-                    function_args = json.loads(tool_call.function.arguments)
-                    ai_title = function_args.get("title")
-                    ai_summary = function_args.get("summary")
-                    return ai_title, ai_summary
-            raise AINewsException("No valid response from AI model")
+            return parse_summary_message(response.choices[0].message)
         except Exception as e:
             logger.error(f"Error in summarize_news: {e}")
             return "", ""
 
+    def get_shared_summary(self, news: pd.Series) -> Optional[tuple[str, str, str]]:
+        """其他訂閱源已摘要過同一篇文章時，直接沿用，不再呼叫模型"""
+        if self.re_summarize or news.get('is_updated', False):
+            return None
+        record = self.article_store.get(news['link'])
+        if not record or not record.get('ai_title') or not record.get('ai_summary'):
+            return None
+        logger.info(f"沿用共享摘要：{record['ai_title']}")
+        return record['ai_title'], record['ai_summary'], record.get('content_hash')
+
+    @staticmethod
+    def has_valid_summary(news: pd.Series) -> bool:
+        ai_title = news.get('ai_title')
+        return isinstance(ai_title, str) and bool(ai_title) and ai_title != '處理失敗'
+
+    def summarize_entry(self, news: pd.Series) -> tuple[str, str, Optional[str]]:
+        """回傳 (ai_title, ai_summary, content_hash)，內容雜湊與上次相同時沿用既有摘要"""
+        title = news['title']
+
+        stored_summary = self.get_shared_summary(news)
+        if stored_summary is not None:
+            return stored_summary
+
+        content_hash = None
+        try:
+            news_content = self.get_content(news['link'])
+            if news_content is None:
+                raise Exception("找不到新聞內容")
+
+            # 重新爬取後內容沒變（只是 feed 時間更新），不必重新摘要
+            content_hash = get_content_hash(news_content)
+            if not self.re_summarize and news.get('content_hash') == content_hash and self.has_valid_summary(news):
+                logger.info(f"內容未變更，沿用摘要：{news['ai_title']}")
+                return news['ai_title'], news['ai_summary'], content_hash
+
+            news_content = self.cleaner.prepare(news['link'], news_content, self.summary_token_budget)
+
+            ai_title, ai_summary = self.summarize_news(title, news_content)
+            if ai_title == '處理失敗' or not ai_title or not ai_summary:
+                raise Exception("摘要生成失敗")
+            self.article_store.put_summary(news['link'], ai_title, ai_summary)
+            logger.info(f"Processed: {ai_title}")
+            return ai_title, ai_summary, content_hash
+        except Exception as e:
+            logger.error(f"Error processing {title}: {e}")
+            return "處理失敗", f"處理過程中發生錯誤: {str(e)}", content_hash
+
+    def summarize_and_record(self, news: pd.Series) -> tuple[str, str, Optional[str]]:
+        """摘要一則新聞，成功後立即寫入日誌"""
+        result = self.summarize_entry(news)
+        if result[0] and result[0] != '處理失敗':
+            self.journal.append(news['link'], *result)
+        return result
+
+    def resume_from_journal(self, entries_df: pd.DataFrame) -> pd.DataFrame:
+        """把上次中斷前已完成的摘要寫回待處理的列，並把這些列標記為不需處理"""
+        journaled = self.journal.load()
+        if not journaled:
+            return entries_df
+        resumable = entries_df['needs_processing'] & entries_df['link'].isin(journaled.keys())
+        if resumable.any():
+            records = [journaled[link] for link in entries_df.loc[resumable, 'link']]
+            entries_df['content_hash'] = entries_df['content_hash'].astype(object)
+            entries_df.loc[resumable, ['ai_title', 'ai_summary', 'content_hash']] = [
+                (record['ai_title'], record['ai_summary'], record['content_hash']) for record in records
+            ]
+            entries_df.loc[resumable, 'needs_processing'] = False
+            logger.info(f"從日誌接續 {int(resumable.sum())} 則已完成的摘要")
+        return entries_df
+
+    def current_content_hash(self, url: str) -> Optional[str]:
+        record = self.article_store.get(url)
+        return record.get('content_hash') if record else None
+
+    def plan_entries(self, entries_df: pd.DataFrame, existing_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        以一次合併決定每則新聞要沿用既有摘要，還是需要重新爬取和摘要。
+
+        回傳的 DataFrame 會帶上既有的 ai_title / ai_summary / content_hash，以及
+        needs_processing（需爬取並摘要）和 is_updated（feed 的發布或更新時間往前推進，需強制重新爬取）兩個欄位。
+        內容庫中的內容雜湊與 CSV 記錄不同的新聞（例如被其他訂閱源重新爬取過）只需重新摘要，不必重新爬取。
+        """
+        planned = entries_df.copy()
+        if existing_df is None or existing_df.empty or 'ai_title' not in existing_df.columns:
+            planned['ai_title'] = None
+            planned['ai_summary'] = None
+            planned['content_hash'] = None
+            planned['is_updated'] = False
+            planned['needs_processing'] = True
+            return planned
+
+        previous = existing_df.drop_duplicates('link', keep='last')
+        nan_column = pd.Series(float('nan'), index=previous.index)
+        previous = pd.DataFrame({
+            'link': previous['link'],
+            'ai_title': previous['ai_title'],
+            'ai_summary': previous.get('ai_summary'),
+            'content_hash': previous.get('content_hash', pd.Series(None, index=previous.index, dtype=object)),
+            'previous_revision_ts': pd.concat([
+                previous.get('published_ts', nan_column), previous.get('updated_ts', nan_column)
+            ], axis=1).max(axis=1),
+        })
+        planned = planned.merge(previous, on='link', how='left', indicator=True)
+
+        revision_ts = planned[['published_ts', 'updated_ts']].max(axis=1)
+        is_new = planned['_merge'] == 'left_only'
+        is_failed = planned['ai_title'].isna() | (planned['ai_title'] == '處理失敗')
+        is_updated = ~is_new & (revision_ts > planned['previous_revision_ts'])
+
+        # 只對其餘可沿用的列比對內容雜湊
+        unchanged = ~(is_new | is_failed | is_updated) & planned['content_hash'].notna()
+        hash_changed = pd.Series(False, index=planned.index)
+        if unchanged.any():
+            current_hashes = planned.loc[unchanged, 'link'].map(self.current_content_hash)
+            hash_changed.loc[unchanged] = current_hashes.notna() & (current_hashes != planned.loc[unchanged, 'content_hash'])
+
+        planned['is_updated'] = is_updated
+        planned['needs_processing'] = is_new | is_failed | is_updated | hash_changed | self.re_fetch
+        return planned.drop(columns=['_merge', 'previous_revision_ts'])
+
+    def commit_feed_state(self) -> None:
+        if self.pending_validators is None and self.pending_watermark is None:
+            return
+        try:
+            if self.pending_validators is not None:
+                self.feed_state.update_validators(*self.pending_validators)
+            if self.pending_watermark is not None:
+                self.feed_state.update_watermark(self.pending_watermark)
+            self.feed_state.save()
+            self.pending_validators = None
+            self.pending_watermark = None
+        except Exception as e:
+            logger.warning(f"保存訂閱源狀態失敗：{e}")
+
     def run(self) -> None:
+        self.not_modified = False
         try:
             feed_data = self.parse_feed()
+            if feed_data['not_modified']:
+                self.not_modified = True
+                logger.info(f"訂閱源未變更 (304)，跳過本次處理：{self.source}_{self.feed_name}")
+                return
+
             if not feed_data['entries']:
                 logger.error("No entries found in the feed. Exiting.")
                 return
 
             entries_df = pd.DataFrame(feed_data['entries'])
-            self.fetch_news_content(feed_data['entries'])
-            
+            entries_df['published_ts'] = pd.to_numeric(entries_df['published_ts'], errors='coerce')
+            entries_df['updated_ts'] = pd.to_numeric(entries_df['updated_ts'], errors='coerce')
+            # 每一則的修訂時間，任何一則比上次處理時更新都要重新規劃
+            revision_ts = entries_df[['published_ts', 'updated_ts']].max(axis=1)
+            revisions = {guid: None if pd.isna(ts) else float(ts) for guid, ts in zip(entries_df['guid'], revision_ts)}
+
+            forced = self.re_fetch or self.re_summarize
+            if not forced and self.has_saved_data() and self.feed_state.is_caught_up(revisions):
+                logger.info(f"沒有新的或更新的新聞，跳過本次處理：{self.source}_{self.feed_name}")
+                self.commit_feed_state()
+                return
+
             # 檢查是否已存在摘要資料
             existing_df = None
-            if not self.re_summarize and self.filename.exists():
-                existing_df = pd.read_csv(self.filename)
-            
-            for index, news in entries_df.iterrows():
-                title = news['title']
-                safe_link = self.get_safe_filename(news["link"])
-                file_path = self.content_folder / safe_link
-                
-                # 檢查是否需要摘要
-                if not self.re_summarize and existing_df is not None and news['link'] in existing_df['link'].values:
-                    existing_row = existing_df[existing_df['link'] == news['link']].iloc[0]
-                    if existing_row['ai_title'] != '處理失敗':
-                        entries_df.loc[index, 'ai_title'] = existing_row['ai_title']
-                        entries_df.loc[index, 'ai_summary'] = existing_row['ai_summary']
-                        logger.info(f"Skipped summarization: {existing_row['ai_title']}")
-                        continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        news_content = f.read()
-                    
-                    ai_title, ai_summary = self.summarize_news(title, news_content)
-                    if ai_title == '處理失敗' or not ai_title or not ai_summary:
-                        raise Exception("摘要生成失敗")
-                    entries_df.loc[index, 'ai_title'] = ai_title
-                    entries_df.loc[index, 'ai_summary'] = ai_summary
-                    logger.info(f"Processed: {ai_title}")
-                except Exception as e:
-                    logger.error(f"Error processing {title}: {e}")
-                    entries_df.loc[index, 'ai_title'] = "處理失敗"
-                    entries_df.loc[index, 'ai_summary'] = f"處理過程中發生錯誤: {str(e)}"
-
-            self.save_to_csv(entries_df)
-            logger.info(f"Successfully saved results to {self.filename}")
+            if not self.re_summarize:
+                existing_df = self.load_existing()
+
+            entries_df = self.plan_entries(entries_df, existing_df)
+            # 規劃時沿用的既有摘要，用來找出本次（含從日誌接續）摘要有變動的列
+            previous_summaries = entries_df[['ai_title', 'ai_summary']].copy()
+            entries_df = self.resume_from_journal(entries_df)
+            pending_df = entries_df[entries_df['needs_processing']]
+            logger.info(f"新增或更新 {len(pending_df)} 則，沿用既有摘要 {len(entries_df) - len(pending_df)} 則")
+
+            if not pending_df.empty:
+                self.fetch_news_content(pending_df.to_dict(orient='records'))
+                if self.batch_mode:
+                    # 摘要留空，由 Batch API 稍後補上
+                    results = [self.get_shared_summary(news) or (None, None, None) for _, news in pending_df.iterrows()]
+                    logger.info(f"Batch 模式：{sum(1 for title, _, _ in results if title is None)} 則待 Batch API 摘要")
+                else:
+                    # executor.map 依輸入順序回傳結果，確保寫回正確的列
+                    with ThreadPoolExecutor(max_workers=self.max_inflight_summaries, thread_name_prefix="summarize") as executor:
+                        results = list(executor.map(self.summarize_and_record, [news for _, news in pending_df.iterrows()]))
+                entries_df['content_hash'] = entries_df['content_hash'].astype(object)
+                entries_df.loc[pending_df.index, ['ai_title', 'ai_summary', 'content_hash']] = results
+
+            entries_df = entries_df.drop(columns=['needs_processing', 'is_updated'])
+            self.save_results(entries_df)
+            self.journal.clear()
+
+            succeeded = entries_df[entries_df['ai_title'].notna() & (entries_df['ai_title'] != '處理失敗')]
+            previous = previous_summaries.loc[succeeded.index]
+            changed = (succeeded['ai_title'] != previous['ai_title']) | (succeeded['ai_summary'] != previous['ai_summary'])
+            self.archive_processed(succeeded[changed])
+            self.pending_watermark = {guid: revisions.get(guid) for guid in succeeded['guid']}
+            self.commit_feed_state()
+            logger.info(f"Successfully saved results for {self.source}_{self.feed_name}")
         except AINewsException as e:
             logger.error(f"AINews error: {e}")
         except Exception as e:
@@ -273,7 +539,12 @@ def main():
         parser.add_argument('-f', '--feed', help='Choose specific feed')
         parser.add_argument('-ff', '--force-fetch', action='store_true', help='Force fetch all news content')
         parser.add_argument('-p', '--use-proxy', action='store_true', help='Use proxy for fetching news content')
+        parser.add_argument('-m', '--max-inflight', type=int, default=4, help='Maximum concurrent summarization requests')
+        parser.add_argument('--no-cache', action='store_true', help='Bypass the LLM response cache')
+        parser.add_argument('-b', '--batch', action='store_true', help='Fetch only and leave summarization to src.batch_summarize')
+        parser.add_argument('--no-csv', action='store_true', help='Save to the news database only, without exporting the feed CSV')
         args = parser.parse_args()
+        get_llm_cache().bypass = get_llm_cache().bypass or args.no_cache
 
         if not args.source:
             source_options = [source['name'] for source in rss_config['news_sources'].values()]
@@ -299,8 +570,9 @@ def main():
         rss_feed_url = feed['url']
         logger.info(f"Selected feed: {feed['name']}")
 
-        ai_news = AINews(rss_feed_url, args.source, args.feed, re_fetch=args.force_fetch, use_proxy=args.use_proxy)
+        ai_news = AINews(rss_feed_url, args.source, args.feed, re_fetch=args.force_fetch, use_proxy=args.use_proxy, max_inflight_summaries=args.max_inflight, batch_mode=args.batch, export_csv=not args.no_csv)
         ai_news.run()
+        get_llm_cache().log_stats()
     except AINewsException as e:
         logger.error(f"AINews error in main: {e}")
     except Exception as e:
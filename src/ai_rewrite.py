@@ -1,14 +1,34 @@
 from dotenv import load_dotenv
 from openai import OpenAI
+import hashlib
+import json
 import os
+import threading
 import pandas as pd
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from src.content_store import read_content
+from src.llm_cache import get_llm_cache
+from src.news_db import get_news_db
+
+REWRITE_MODEL = "gpt-4o-mini"
+REWRITE_SYSTEM_PROMPT = "你是一位專業的記者，請根據以下要求生成廣播新聞腳本，以繁體中文(zh-tw)輸出。"
 
 class AIRewrite:
-    def __init__(self):
+    """
+    把選出的新聞改寫成廣播腳本。
+
+    輸出資料夾中的 .manifest.json 記錄每個腳本對應的輸入雜湊（模型、系統提示與展開後的提示），
+    輸入沒變且腳本仍在時直接略過。改寫最多同時進行 max_inflight 則，
+    模型輸出邊產生邊寫入 .txt.part，完成後才換成正式的 .txt。
+    """
+
+    def __init__(self, max_inflight: int = 4):
         load_dotenv()
         self.client = OpenAI()
+        self.max_inflight = max(1, max_inflight)
+        self.manifest_lock = threading.Lock()
         
         # 路徑相關參數
         self.data_dir = Path("./data")
@@ -18,31 +38,80 @@ class AIRewrite:
         self.prompt_dir = Path("./prompt")
         
         self.prompt_path = self.prompt_dir / "broadcast_transcript.txt"
-
-    def rewrite_news(self, original_content: str, title: str) -> str:
+        # 模板只讀一次，所有改寫共用
         with open(self.prompt_path, 'r', encoding='utf-8') as f:
-            prompt_template = f.read()
+            self.prompt_template = f.read()
 
+    def build_prompt(self, original_content: str, title: str) -> str:
         # 檢查所需的鍵是否存在於提示模板中
         try:
-            prompt = prompt_template.format(title=title, selected_news_items=original_content)
+            return self.prompt_template.format(title=title, selected_news_items=original_content)
         except KeyError as e:
             print(f"提示模板缺少鍵: {e}")
             return ""
 
+    @staticmethod
+    def input_hash(prompt: str) -> str:
+        payload = json.dumps([REWRITE_MODEL, REWRITE_SYSTEM_PROMPT, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def rewrite_news(self, original_content: str, title: str, output_path: Path = None) -> str:
+        """
+        改寫一則新聞；有 output_path 時把模型輸出串流寫入 output_path.part，成功後換成 output_path。
+        """
+        prompt = self.build_prompt(original_content, title)
+        if not prompt:
+            return ""
+
+        part_path = output_path.with_name(output_path.name + '.part') if output_path else None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "你是一位專業的記者，請根據以下要求生成廣播新聞腳本，以繁體中文(zh-tw)輸出。"},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content
+            f = open(part_path, 'w', encoding='utf-8') if part_path else None
+            try:
+                def on_text(text: str) -> None:
+                    if f is not None:
+                        f.write(text)
+                        f.flush()
+
+                content = get_llm_cache().stream_chat_completion(
+                    self.client,
+                    "rewrite_news",
+                    on_text,
+                    model=REWRITE_MODEL,
+                    messages=[
+                        {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ]
+                )
+            finally:
+                if f is not None:
+                    f.close()
+            if part_path:
+                os.replace(part_path, output_path)
+            return content
         except Exception as e:
             print(f"重寫新聞時發生錯誤: {e}")
+            if part_path and part_path.exists():
+                part_path.unlink()
             return ""
 
+    @staticmethod
+    def load_manifest(manifest_path: Path) -> dict:
+        if not manifest_path.exists():
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"讀取改寫紀錄失敗，將重新建立: {manifest_path} - {e}")
+            return {}
+
+    def save_manifest(self, manifest_path: Path, manifest: dict) -> None:
+        with self.manifest_lock:
+            tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, manifest_path)
+
     def get_news_files(self):
         return [f for f in os.listdir(self.news_chosen_dir) if f.endswith('.csv')]
 
@@ -61,31 +130,71 @@ class AIRewrite:
             except ValueError:
                 print("請輸入有效的數字。")
 
+    def rewrite_row(self, position: int, row: dict, content_folder: Path, output_folder: Path, manifest: dict,
+                    manifest_path: Path) -> str:
+        link = row['link']
+        safe_filename = self.get_safe_filename(link).replace('.txt', '')
+        content_file_path = content_folder / f"{safe_filename}.txt"
+        news_content = read_content(link, content_file_path)
+        if news_content is None:
+            print(f"找不到對應的新聞內容: {link}")
+            return 'missing'
+
+        output_name = f"{safe_filename}.txt"
+        output_path = output_folder / output_name
+        prompt_hash = self.input_hash(self.build_prompt(news_content, row['title']))
+        entry = manifest.get(output_name)
+        if output_path.exists() and entry and entry.get('input_hash') == prompt_hash:
+            # 播出順序與標題可能變了，仍更新紀錄
+            with self.manifest_lock:
+                entry.update(title=row['title'], position=position)
+            print(f"內容與提示未變更，跳過: {output_name}")
+            return 'skipped'
+
+        rewritten_content = self.rewrite_news(news_content, row['title'], output_path)
+        if not rewritten_content:
+            return 'failed'
+
+        with self.manifest_lock:
+            manifest[output_name] = {'link': link, 'title': row['title'], 'position': position,
+                                     'input_hash': prompt_hash}
+        self.save_manifest(manifest_path, manifest)
+        get_news_db().put_artifact(link, 'rewrite', output_path)
+        print(f"已生成重寫內容: {output_name}")
+        return 'rewritten'
+
+    def open_feed(self, source: str, feed_name: str) -> tuple:
+        """建立 feed 的輸出資料夾並讀取改寫紀錄，回傳 rewrite_row 需要的 (內容資料夾, 輸出資料夾, 紀錄, 紀錄路徑)"""
+        output_folder = self.news_rewrite_dir / f"{source}_{feed_name}"
+        output_folder.mkdir(parents=True, exist_ok=True)
+        content_folder = self.news_content_dir / f"{source}_{feed_name}"
+        manifest_path = output_folder / ".manifest.json"
+        return content_folder, output_folder, self.load_manifest(manifest_path), manifest_path
+
     def run(self, chosen_output_filename):
         selected_file = os.path.basename(chosen_output_filename)
         source, feed_name = selected_file.replace('.csv', '').split('_', 1)
-        output_folder = self.news_rewrite_dir / f"{source}_{feed_name}"
-        output_folder.mkdir(parents=True, exist_ok=True)
+        content_folder, output_folder, manifest, manifest_path = self.open_feed(source, feed_name)
 
-        content_folder = self.news_content_dir / f"{source}_{feed_name}"
-        
         news_df = pd.read_csv(self.news_chosen_dir / selected_file)
+        rows = news_df.to_dict(orient='records')
 
-        for index, row in news_df.iterrows():
-            link = row['link']
-            safe_filename = self.get_safe_filename(link).replace('.txt', '')
-            content_file_path = content_folder / f"{safe_filename}.txt"
-
-            if content_file_path.exists():
-                with open(content_file_path, 'r', encoding='utf-8') as f:
-                    news_content = f.read()
-                rewritten_content = self.rewrite_news(news_content, row['title'])
+        results = {'rewritten': 0, 'skipped': 0, 'failed': 0, 'missing': 0}
+        with ThreadPoolExecutor(max_workers=self.max_inflight) as executor:
+            futures = [
+                executor.submit(self.rewrite_row, position, row, content_folder, output_folder, manifest, manifest_path)
+                for position, row in enumerate(rows)
+            ]
+            for future in as_completed(futures):
+                try:
+                    results[future.result()] += 1
+                except Exception as e:
+                    print(f"重寫新聞時發生錯誤: {e}")
+                    results['failed'] += 1
+        self.save_manifest(manifest_path, manifest)
 
-                with open(output_folder / f"{safe_filename}.txt", 'w', encoding='utf-8') as f:
-                    f.write(rewritten_content)
-                print(f"已生成重寫內容: {safe_filename}.txt")
-            else:
-                print(f"找不到對應的內容檔案: {content_file_path}")
+        print(f"改寫完成：新生成 {results['rewritten']} 則，跳過 {results['skipped']} 則，"
+              f"失敗 {results['failed']} 則，缺少內容 {results['missing']} 則")
 
     @staticmethod
     def get_safe_filename(url: str) -> str:
@@ -94,12 +203,14 @@ class AIRewrite:
         return f"{safe_string[:200]}.txt"
 
 if __name__ == "__main__":
-    ai_rewrite = AIRewrite()
     parser = argparse.ArgumentParser(description="重寫新聞內容")
     parser.add_argument('-f', '--file', help='選擇的新聞 CSV 文件名稱')
+    parser.add_argument('--max-inflight', type=int, default=4, help='同時進行的改寫數量上限')
     args = parser.parse_args()
+    ai_rewrite = AIRewrite(max_inflight=args.max_inflight)
 
     if not args.file:
         args.file = ai_rewrite.select_news_file()
 
-    ai_rewrite.run(args.file)
\ No newline at end of file
+    ai_rewrite.run(args.file)
+    get_llm_cache().log_stats()
\ No newline at end of file
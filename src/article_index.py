@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+import pandas as pd
+from src.config.log_config import setup_logger
+from src.content_store import read_content
+from utils.file_utils import get_safe_filename
+
+logger = setup_logger(__name__)
+
+class ArticleIndex:
+    """
+    每個處理週期建立一次的記憶體文章索引。
+
+    以 link 對應到合併後新聞資料中的一列，取代逐則掃描整個 DataFrame；
+    文章內容在第一次使用時才讀取，並以有上限的 LRU 快取保存。
+    """
+
+    def __init__(self, news_df: Optional[pd.DataFrame], content_cache_size: int = 256,
+                 news_content_dir: Path = Path("./data/news_content")):
+        self.rows: Dict[str, Dict] = {}
+        if news_df is not None:
+            for record in news_df.to_dict(orient='records'):
+                self.rows.setdefault(record['link'], record)
+        self.content_cache_size = max(0, content_cache_size)
+        self.news_content_dir = Path(news_content_dir)
+        self.contents: OrderedDict[str, str] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, link: str) -> bool:
+        return link in self.rows
+
+    def get_row(self, link: str) -> Optional[Dict]:
+        return self.rows.get(link)
+
+    def get_content(self, link: str) -> Optional[str]:
+        with self.lock:
+            if link in self.contents:
+                self.contents.move_to_end(link)
+                self.hits += 1
+                return self.contents[link]
+            self.misses += 1
+
+        row = self.rows.get(link)
+        legacy_file = None
+        if row is not None:
+            # 舊版的單檔內容依 source_feed 分資料夾
+            legacy_file = self.news_content_dir / f"{row.get('source')}_{row.get('feed')}" / get_safe_filename(link)
+        content = read_content(link, legacy_file)
+
+        if content is not None and self.content_cache_size:
+            with self.lock:
+                self.contents[link] = content
+                self.contents.move_to_end(link)
+                while len(self.contents) > self.content_cache_size:
+                    self.contents.popitem(last=False)
+        return content
+
+    def log_stats(self) -> None:
+        logger.info(f"文章索引：{len(self.rows)} 則新聞，內容快取命中 {self.hits} / 未命中 {self.misses}")
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+from src.config.log_config import setup_logger
+from src.content_store import ContentStore, get_content_store
+from utils.file_utils import canonicalize_url
+
+logger = setup_logger(__name__)
+
+def get_article_key(url: str) -> str:
+    return hashlib.sha1(canonicalize_url(url).encode('utf-8')).hexdigest()
+
+def get_content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+class ArticleStore:
+    """
+    跨訂閱源共用的文章庫，以正規化 URL 為鍵保存爬取內容和 AI 摘要。
+
+    內容與摘要記錄都存放在打包的內容庫中（記錄使用 article 命名空間）。
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, content_store: Optional[ContentStore] = None):
+        self.content_store = content_store or get_content_store()
+
+    def _write(self, url: str, record: Dict) -> None:
+        self.content_store.put(url, json.dumps(record, ensure_ascii=False), namespace='article')
+
+    def get(self, url: str) -> Optional[Dict]:
+        raw = self.content_store.get(url, namespace='article')
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception as e:
+            logger.warning(f"讀取文章庫記錄失敗：{url} - {e}")
+            return None
+
+    def get_content(self, url: str) -> Optional[str]:
+        return self.content_store.get(url)
+
+    def get_summary(self, url: str) -> Optional[tuple[str, str]]:
+        record = self.get(url)
+        if record and record.get('ai_title') and record.get('ai_summary'):
+            return record['ai_title'], record['ai_summary']
+        return None
+
+    def put_content(self, url: str, content: str) -> None:
+        with self._lock:
+            record = self.get(url) or {'url': url, 'canonical_url': canonicalize_url(url)}
+            content_hash = get_content_hash(content)
+            if record.get('content_hash') != content_hash:
+                # 內容變了，舊摘要不再適用
+                record.pop('ai_title', None)
+                record.pop('ai_summary', None)
+                self.content_store.put(url, content)
+            record['content_hash'] = content_hash
+            record['updated_at'] = time.time()
+            self._write(url, record)
+
+    def put_summary(self, url: str, ai_title: str, ai_summary: str) -> None:
+        with self._lock:
+            record = self.get(url) or {'url': url, 'canonical_url': canonicalize_url(url)}
+            record['ai_title'] = ai_title
+            record['ai_summary'] = ai_summary
+            record['updated_at'] = time.time()
+            self._write(url, record)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+AUDIO_CACHE_DIR = Path("./data/cache/audio")
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_script(text: str) -> str:
+    """統一全形/半形與空白，只差在排版的腳本視為相同"""
+    return WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+class AudioCache:
+    """
+    以內容定址保存的語音合成結果。
+
+    鍵為正規化後的文字、語音與模型的雜湊，音訊存成 <鍵前兩碼>/<鍵>.mp3；
+    相同的文字不論來自哪個 feed 或第幾次執行都直接取用。SQLite 索引記錄大小與最後使用時間，
+    總大小超過上限時淘汰最久未使用者。
+    """
+
+    def __init__(self, cache_dir: Path = AUDIO_CACHE_DIR, max_size_mb: float = 2048, bypass: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.bypass = bypass or os.environ.get('AUDIO_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS audio (
+                    key TEXT PRIMARY KEY,
+                    voice TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_accessed_at ON audio (accessed_at)")
+        self.evict()
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite3 連線不能跨執行緒使用，每個執行緒各自一條
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_dir / "index.sqlite", timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(text: str, voice: str, model: str) -> str:
+        payload = json.dumps([normalize_script(text), voice, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        if self.bypass or not path.exists():
+            with self.lock:
+                self.misses += 1
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        with self.connect() as conn:
+            conn.execute("UPDATE audio SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes, voice: str, model: str) -> None:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO audio (key, voice, model, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, voice, model, len(data), now, now),
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        """總大小超過上限時刪除最久未使用的音訊"""
+        with self.connect() as conn:
+            total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM audio").fetchone()[0]
+            if total_size <= self.max_size:
+                return
+            rows = conn.execute("SELECT key, size FROM audio ORDER BY accessed_at").fetchall()
+            evicted = []
+            for key, size in rows:
+                if total_size <= self.max_size:
+                    break
+                self.path_for(key).unlink(missing_ok=True)
+                evicted.append((key,))
+                total_size -= size
+            conn.executemany("DELETE FROM audio WHERE key = ?", evicted)
+            logger.info(f"語音快取超過大小上限，已淘汰 {len(evicted)} 個檔案")
+
+    def log_stats(self) -> None:
+        if self.hits or self.misses:
+            logger.info(f"語音快取統計：命中 {self.hits} / 未命中 {self.misses}" + ("（已停用）" if self.bypass else ""))
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+def get_audio_cache() -> AudioCache:
+    """取得整個行程共用的語音快取"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AudioCache()
+        return _cache
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import openai
+import pandas as pd
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+from src.ai_news import AINews, build_summary_request, parse_summary_message
+from src.article_store import ArticleStore, get_article_key, get_content_hash
+from src.content_cleaner import ContentCleaner
+from src.content_store import get_content_store, read_content
+from src.news_archive import NewsArchive
+from src.news_db import get_news_db
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BATCH_DIR = Path("./data/batch")
+NEWS_DIR = Path("./data/news")
+NEWS_CONTENT_DIR = Path("./data/news_content")
+
+# Batch 狀態中表示已完成、不需再輪詢的狀態
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+class OpenAIBatchBackend:
+    """透過 OpenAI Files 與 Batches API 提交批次"""
+
+    name = 'openai'
+
+    def __init__(self):
+        load_dotenv()
+        self.client = openai.OpenAI()
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def retrieve(self, batch_id: str) -> Dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        }
+
+    def download(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+class LocalBatchBackend:
+    """
+    離線的 Batch API 替身，不需網路即可測試整個提交、輪詢、合併流程。
+
+    提交時直接產生與 Batch API 相同格式的輸出檔，每個請求以標題與內容開頭作為假摘要。
+    """
+
+    name = 'local'
+
+    def __init__(self, work_dir: Path = BATCH_DIR / "local"):
+        self.work_dir = Path(work_dir)
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        with open(input_path, 'r', encoding='utf-8') as src, \
+                open(self.work_dir / f"{batch_id}_output.jsonl", 'w', encoding='utf-8') as dst:
+            for line in src:
+                request = json.loads(line)
+                dst.write(json.dumps(self.respond(request), ensure_ascii=False) + "\n")
+        return batch_id
+
+    @staticmethod
+    def respond(request: Dict) -> Dict:
+        user_message = request['body']['messages'][-1]['content']
+        title, _, content = user_message.partition(', content: ')
+        arguments = {"title": f"[離線] {title.replace('title: ', '', 1)}", "summary": content[:200]}
+        body = {
+            "id": f"chatcmpl-{request['custom_id']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request['body']['model'],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_local",
+                        "type": "function",
+                        "function": {"name": "output_title_and_summary", "arguments": json.dumps(arguments, ensure_ascii=False)},
+                    }],
+                },
+            }],
+        }
+        return {"id": f"batch_req_{request['custom_id']}", "custom_id": request['custom_id'],
+                "response": {"status_code": 200, "body": body}, "error": None}
+
+    def retrieve(self, batch_id: str) -> Dict:
+        output_path = self.work_dir / f"{batch_id}_output.jsonl"
+        return {
+            "status": "completed" if output_path.exists() else "failed",
+            "output_file_id": batch_id if output_path.exists() else None,
+            "error_file_id": None,
+        }
+
+    def download(self, file_id: str) -> str:
+        with open(self.work_dir / f"{file_id}_output.jsonl", 'r', encoding='utf-8') as f:
+            return f.read()
+
+class BatchSummarizer:
+    """
+    以 OpenAI Batch API 大量摘要新聞。
+
+    從新聞資料庫收集尚未摘要的新聞，寫成 JSONL 後提交，輪詢完成後把結果寫回資料庫，
+    已有 CSV 的訂閱源再重新匯出 CSV。
+    批次狀態保存在 data/batch/state.json，中斷後重新執行會接續輪詢與合併，不會重複提交。
+    """
+
+    def __init__(self, backend=None, summary_token_budget: int = 6000, batch_dir: Path = BATCH_DIR,
+                 export_csv: bool = True):
+        self.backend = backend or OpenAIBatchBackend()
+        self.export_csv = export_csv
+        self.summary_token_budget = summary_token_budget
+        self.batch_dir = Path(batch_dir)
+        self.state_path = self.batch_dir / "state.json"
+        self.content_store = get_content_store()
+        self.article_store = ArticleStore(self.content_store)
+        self.cleaner = ContentCleaner(self.content_store)
+        self.archive = NewsArchive()
+
+    def load_state(self) -> Optional[Dict]:
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_state(self, state: Dict) -> None:
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def collect_pending(self, feeds: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Dict]:
+        """
+        從新聞資料庫找出所有尚未摘要的新聞，同一篇文章（正規化 URL 相同）只送出一個請求。
+
+        Returns:
+            Dict[str, Dict]: custom_id 對應的請求內容、原始內容雜湊與要寫回的 (source, feed, link) 清單。
+        """
+        pending: Dict[str, Dict] = {}
+        for row in get_news_db().read_pending_summaries(feeds).to_dict(orient='records'):
+            target = [row['source'], row['feed'], row['link']]
+            custom_id = get_article_key(row['link'])
+            if custom_id in pending:
+                pending[custom_id]['targets'].append(target)
+                continue
+
+            legacy_file = NEWS_CONTENT_DIR / f"{row['source']}_{row['feed']}" / AINews.get_safe_filename(row['link'])
+            content = read_content(row['link'], legacy_file)
+            if content is None:
+                logger.warning(f"找不到新聞內容，略過：{row['link']}")
+                continue
+            content_hash = get_content_hash(content)
+            content = self.cleaner.prepare(row['link'], content, self.summary_token_budget)
+            pending[custom_id] = {
+                "body": build_summary_request(row['title'], content),
+                "content_hash": content_hash,
+                "targets": [target],
+            }
+        return pending
+
+    def submit(self, feeds: Optional[List[Tuple[str, str]]] = None) -> Optional[Dict]:
+        pending = self.collect_pending(feeds)
+        if not pending:
+            logger.info("沒有需要摘要的新聞")
+            return None
+
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        input_path = self.batch_dir / f"input_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for custom_id, item in pending.items():
+                request = {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": item['body']}
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        batch_id = self.backend.submit(input_path)
+        state = {
+            "batch_id": batch_id,
+            "backend": self.backend.name,
+            "status": "submitted",
+            "input_path": str(input_path),
+            "submitted_at": time.time(),
+            "targets": {custom_id: item['targets'] for custom_id, item in pending.items()},
+            "content_hashes": {custom_id: item['content_hash'] for custom_id, item in pending.items()},
+        }
+        self.save_state(state)
+        logger.info(f"已提交批次 {batch_id}，共 {len(pending)} 個摘要請求")
+        return state
+
+    def poll(self, state: Dict, wait: bool = True, interval: float = 60) -> Dict:
+        while True:
+            info = self.backend.retrieve(state['batch_id'])
+            state.update(info)
+            self.save_state(state)
+            logger.info(f"批次 {state['batch_id']} 狀態：{info['status']}")
+            if info['status'] in TERMINAL_STATUSES or not wait:
+                return state
+            time.sleep(interval)
+
+    def merge(self, state: Dict) -> int:
+        """把批次結果寫回新聞資料庫、共享文章庫與 Parquet 封存，export_csv 時一併重新匯出已有 CSV 的訂閱源，回傳成功合併的摘要數"""
+        if not state.get('output_file_id'):
+            logger.error(f"批次 {state['batch_id']} 沒有輸出檔，狀態：{state.get('status')}")
+            return 0
+
+        summaries: Dict[str, tuple] = {}
+        feeds = set()
+        failed = 0
+        for line in self.backend.download(state['output_file_id']).splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            targets = state['targets'].get(result['custom_id'], [])
+            content_hash = state.get('content_hashes', {}).get(result['custom_id'])
+            try:
+                if result.get('error') or result['response']['status_code'] != 200:
+                    raise ValueError(result.get('error') or result['response']['status_code'])
+                completion = ChatCompletion.model_validate(result['response']['body'])
+                ai_title, ai_summary = parse_summary_message(completion.choices[0].message)
+                if not ai_title or not ai_summary:
+                    raise ValueError("摘要生成失敗")
+            except Exception as e:
+                logger.error(f"批次請求 {result['custom_id']} 失敗：{e}")
+                failed += 1
+                continue
+            for target in targets:
+                # 舊版狀態的目標為 (CSV 路徑, link)，新版為 (source, feed, link)
+                summaries[target[-1]] = (ai_title, ai_summary, content_hash)
+                if len(target) == 3:
+                    feeds.add((target[0], target[1]))
+            if targets:
+                self.article_store.put_summary(targets[0][-1], ai_title, ai_summary)
+
+        db = get_news_db()
+        merged = db.update_summaries(summaries) if summaries else 0
+        if summaries:
+            self.archive_merged(db.read_links(summaries.keys()))
+
+        if self.export_csv:
+            for source, feed in sorted(feeds):
+                csv_path = NEWS_DIR / f"{source}_{feed}.csv"
+                if csv_path.exists():
+                    db.export_csv(source, feed, csv_path)
+                    logger.info(f"已重新匯出 {csv_path}")
+
+        state['status'] = 'merged'
+        state['merged_at'] = time.time()
+        self.save_state(state)
+        logger.info(f"批次 {state['batch_id']} 合併完成：成功 {merged} 則，失敗 {failed} 個請求")
+        return merged
+
+    def archive_merged(self, data_frame: pd.DataFrame) -> None:
+        """把合併後的新聞依訂閱源附加到 Parquet 封存，失敗時不影響合併"""
+        for (source, feed), part in data_frame.groupby(['source', 'feed']):
+            try:
+                self.archive.append(source, feed, part.drop(columns=['source', 'feed']))
+            except Exception as e:
+                logger.warning(f"封存新聞失敗：{source}_{feed} - {e}")
+
+    def run(self, feeds: Optional[List[Tuple[str, str]]] = None, wait: bool = True, interval: float = 60) -> None:
+        state = self.load_state()
+        if state and state.get('status') != 'merged':
+            if state.get('backend') != self.backend.name:
+                logger.error(f"未完成的批次 {state['batch_id']} 屬於 {state.get('backend')}，請使用相同的後端繼續")
+                return
+            logger.info(f"接續未完成的批次 {state['batch_id']}")
+        else:
+            state = self.submit(feeds)
+            if state is None:
+                return
+
+        state = self.poll(state, wait=wait, interval=interval)
+        if state['status'] == 'completed':
+            self.merge(state)
+        elif state['status'] in TERMINAL_STATUSES:
+            logger.error(f"批次 {state['batch_id']} 未成功完成：{state['status']}")
+            state['status'] = 'merged'  # 結束這個批次，下次重新收集待摘要的新聞
+            self.save_state(state)
+
+def main():
+    parser = argparse.ArgumentParser(description="以 OpenAI Batch API 大量摘要新聞")
+    parser.add_argument('-f', '--files', nargs='*', help='只處理這些訂閱源，例如 bbc_World 或 bbc_World.csv（預設為全部）')
+    parser.add_argument('--local', action='store_true', help='使用離線替身，不呼叫 OpenAI')
+    parser.add_argument('--no-wait', action='store_true', help='只提交或查詢一次狀態，不等待批次完成')
+    parser.add_argument('--interval', type=float, default=60, help='輪詢間隔秒數')
+    parser.add_argument('--no-csv', action='store_true', help='合併後不重新匯出訂閱源 CSV')
+    args = parser.parse_args()
+
+    feeds = None
+    if args.files:
+        names = {name[:-4] if name.endswith('.csv') else name for name in args.files}
+        feeds = [(source, feed) for source, feed in get_news_db().list_feeds() if f"{source}_{feed}" in names]
+
+    backend = LocalBatchBackend() if args.local else OpenAIBatchBackend()
+    BatchSummarizer(backend, export_csv=not args.no_csv).run(feeds, wait=not args.no_wait, interval=args.interval)
+
+if __name__ == "__main__":
+    main()
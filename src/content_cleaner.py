@@ -0,0 +1,152 @@
+import json
+import re
+from typing import List, Optional
+from src.config.log_config import setup_logger
+from src.article_store import get_content_hash
+from src.content_store import ContentStore, get_content_store
+
+logger = setup_logger(__name__)
+
+# 清理規則變動時調高版本，讓快取的清理結果失效
+CLEANER_VERSION = 2
+
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+LINK_PATTERN = re.compile(r'\[([^\]]*)\]\((?:[^()]|\([^)]*\))*\)')
+BARE_URL_PATTERN = re.compile(r'^\s*<?https?://\S+>?\s*$')
+RULE_PATTERN = re.compile(r'^\s*([-*_=])\1{2,}\s*$')
+BULLET_PATTERN = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+')
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+# r.jina.ai 回傳內容開頭的中繼資料
+JINA_HEADER_PATTERN = re.compile(r'^(Title|URL Source|Published Time|Markdown Content):', re.IGNORECASE)
+
+# 整行只有樣板字句（可帶標點、箭頭等符號）時才移除，內文提到這些字不受影響
+BOILERPLATE_PATTERN = re.compile(
+    r'^[\W_]*(?:cookie settings|(?:accept|reject|manage)(?: all)? cookies|privacy (?:policy|settings)'
+    r'|terms of (?:use|service)|all rights reserved|subscribe(?: now| today)?|sign up(?: now| for free)?'
+    r'|(?:our |free )?newsletters?|advertisement|skip to (?:main )?content|share (?:this(?: article| story)?|on \w+)'
+    r'|follow us(?: on \w+)?|download (?:the|our) app|read more|related(?: stories| articles| topics| content)?'
+    r'|more from [\w ]{1,40}|most (?:read|popular)|you may also like|click here|enable javascript)[\W_]*$',
+    re.IGNORECASE,
+)
+# 版權宣告行：以 © 或 Copyright 加年份開頭
+COPYRIGHT_PATTERN = re.compile(r'^\W*(?:©|copyright\s*(?:©|\(c\)|\d{4}))', re.IGNORECASE)
+# 以句末標點結尾（後面可接引號或括號）的行是內文句子
+SENTENCE_END_PATTERN = re.compile(r'[.!?。！？…]["\'」』”’)）]*$')
+# 只有一兩個字的導覽項目
+NAV_LINE_PATTERN = re.compile(r'^(menu|search|home|log ?in|sign in|sign up|subscribe|share|close|next|previous)$', re.IGNORECASE)
+
+def estimate_tokens(text: str) -> int:
+    """
+    不依賴 tokenizer 的本地 token 估算。
+
+    中日韓字元大約一字一個 token，其餘文字大約每 4 個字元一個 token。
+    """
+    if not text:
+        return 0
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+def is_link_only(line: str) -> bool:
+    """整行幾乎都是連結（導覽列、相關連結列表）；內文句子中的行內連結不算"""
+    links = LINK_PATTERN.findall(line)
+    if not links:
+        return False
+    remainder = LINK_PATTERN.sub('', BULLET_PATTERN.sub('', line))
+    remainder = re.sub(r'[\s|•·,/>-]+', '', remainder)
+    if remainder and SENTENCE_END_PATTERN.search(LINK_PATTERN.sub(r'\1', line).rstrip()):
+        return False
+    if len(links) >= 3:
+        return len(remainder) < 15 * len(links)
+    # 一兩個連結時，連結文字要佔大部分才視為連結列
+    link_text = sum(len(re.sub(r'\s+', '', text)) for text in links)
+    return len(remainder) <= link_text
+
+def clean_content(text: str) -> str:
+    """去除圖片、導覽與相關連結、Cookie 橫幅等樣板內容，並移除重複的段落"""
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if JINA_HEADER_PATTERN.match(stripped) and not stripped.lower().startswith('title:'):
+            continue
+        line = IMAGE_PATTERN.sub('', line)
+        stripped = line.strip()
+        if not stripped:
+            lines.append('')
+            continue
+        if is_link_only(stripped) or BARE_URL_PATTERN.match(stripped) or RULE_PATTERN.match(stripped):
+            continue
+        plain = LINK_PATTERN.sub(r'\1', stripped)
+        if NAV_LINE_PATTERN.match(plain) or BOILERPLATE_PATTERN.match(plain):
+            continue
+        if COPYRIGHT_PATTERN.match(plain) and len(plain) < 120:
+            continue
+        line = LINK_PATTERN.sub(r'\1', line).rstrip()
+        if re.fullmatch(r'#+\s*', line.strip()):
+            continue
+        lines.append(line)
+
+    # 以空行切成段落後去除重複段落
+    seen = set()
+    blocks = []
+    for block in re.split(r'\n\s*\n', '\n'.join(lines)):
+        block = block.strip()
+        if not block:
+            continue
+        fingerprint = re.sub(r'\W+', '', block).lower()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        blocks.append(block)
+    return '\n\n'.join(blocks)
+
+def trim_to_budget(text: str, max_tokens: int) -> str:
+    """依段落順序保留內容，直到達到 token 預算為止"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept: List[str] = []
+    used = 0
+    for block in text.split('\n\n'):
+        block_tokens = estimate_tokens(block) + 1
+        if used + block_tokens > max_tokens:
+            remaining = max_tokens - used
+            if remaining > 50:
+                # 依比例截斷最後一段，保留部分內容
+                ratio = remaining / block_tokens
+                kept.append(block[:int(len(block) * ratio)].rstrip() + '…')
+            break
+        kept.append(block)
+        used += block_tokens
+    return '\n\n'.join(kept)
+
+class ContentCleaner:
+    """在送進 LLM 前清理文章內容；每篇文章只清理一次，結果快取在內容庫的 cleaned 命名空間"""
+
+    def __init__(self, content_store: Optional[ContentStore] = None):
+        self.content_store = content_store or get_content_store()
+
+    def get_cleaned(self, url: str, content: str) -> str:
+        content_hash = get_content_hash(content)
+        cached = self.content_store.get(url, namespace='cleaned')
+        if cached is not None:
+            try:
+                record = json.loads(cached)
+                if record.get('content_hash') == content_hash and record.get('version') == CLEANER_VERSION:
+                    return record['text']
+            except Exception as e:
+                logger.warning(f"讀取清理快取失敗：{url} - {e}")
+
+        cleaned = clean_content(content)
+        logger.info(f"已清理內容：{url} - token 估計 {estimate_tokens(content)} -> {estimate_tokens(cleaned)}")
+        record = {'content_hash': content_hash, 'version': CLEANER_VERSION, 'text': cleaned}
+        self.content_store.put(url, json.dumps(record, ensure_ascii=False), namespace='cleaned')
+        return cleaned
+
+    def prepare(self, url: str, content: str, max_tokens: int) -> str:
+        """回傳清理並裁切至 max_tokens 以內的內容"""
+        cleaned = self.get_cleaned(url, content)
+        trimmed = trim_to_budget(cleaned, max_tokens)
+        if trimmed is not cleaned:
+            logger.info(f"內容超出預算已裁切：{url} - token 估計 {estimate_tokens(cleaned)} -> {estimate_tokens(trimmed)}")
+        return trimmed
@@ -0,0 +1,252 @@
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from utils.file_utils import canonicalize_url
+from src.config.log_config import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只能靠行程內的鎖
+    fcntl = None
+
+logger = setup_logger(__name__)
+
+CONTENT_STORE_DIR = Path("./data/content_store")
+
+# 索引記錄：20 bytes 鍵（sha1）、segment 編號、偏移量、壓縮後長度
+INDEX_RECORD = struct.Struct('<20sIQI')
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+class ContentStore:
+    """
+    打包、壓縮的文章內容庫，取代每個 URL 一個 .txt 的做法。
+
+    內容以 zlib 壓縮後附加寫入 segment 檔，另有一個固定長度記錄的索引檔（可 mmap），
+    鍵為正規化 URL 的 sha1。同一個鍵寫入多次時以最後一筆為準，舊資料由 compact 回收。
+    開啟時會把索引載入成 dict，因此 exists / get 都是 O(1)。
+
+    多個行程可以共用同一個內容庫：每次附加寫入與 compact 都持有 .lock 檔的 flock，
+    確保 segment 偏移量與索引記錄不會交錯。
+    """
+
+    def __init__(self, store_dir: Path = CONTENT_STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.index_path = self.store_dir / "index.bin"
+        self.lock_path = self.store_dir / ".lock"
+        self.lock = threading.RLock()
+        self.index: Dict[bytes, Tuple[int, int, int]] = {}
+        self.index_size = 0
+        self.index_inode = None
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.load_index()
+
+    @staticmethod
+    def make_key(url: str, namespace: str = '') -> bytes:
+        name = canonicalize_url(url)
+        if namespace:
+            name = f"{namespace}\0{name}"
+        return hashlib.sha1(name.encode('utf-8')).digest()
+
+    @contextmanager
+    def file_lock(self):
+        """跨行程的互斥鎖；compact 會替換索引檔，所以鎖在獨立的檔案上而不是索引本身"""
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def segment_path(self, segment_id: int) -> Path:
+        return self.store_dir / f"segment_{segment_id:05d}.dat"
+
+    def load_index(self) -> None:
+        """從頭讀取索引檔（以 mmap 讀取），或在其他行程附加記錄後只讀取新增的尾端"""
+        with self.lock:
+            if not self.index_path.exists():
+                self.index, self.index_size, self.index_inode = {}, 0, None
+                return
+
+            stat = self.index_path.stat()
+            if stat.st_ino != self.index_inode or stat.st_size < self.index_size:
+                # 索引被 compact 替換過，整份重新載入
+                self.index, self.index_size = {}, 0
+            self.index_inode = stat.st_ino
+
+            usable_size = stat.st_size - stat.st_size % INDEX_RECORD.size
+            if usable_size <= self.index_size:
+                return
+            with open(self.index_path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(self.index_size, usable_size, INDEX_RECORD.size):
+                        key, segment_id, data_offset, length = INDEX_RECORD.unpack_from(mapped, offset)
+                        self.index[key] = (segment_id, data_offset, length)
+            self.index_size = usable_size
+
+    def active_segment(self) -> int:
+        segment_ids = [int(path.stem.split('_')[1]) for path in self.store_dir.glob("segment_*.dat")]
+        if not segment_ids:
+            return 0
+        latest = max(segment_ids)
+        if self.segment_path(latest).stat().st_size >= SEGMENT_MAX_BYTES:
+            return latest + 1
+        return latest
+
+    def exists(self, url: str, namespace: str = '') -> bool:
+        key = self.make_key(url, namespace)
+        if key not in self.index:
+            self.load_index()
+        return key in self.index
+
+    def get(self, url: str, namespace: str = '') -> Optional[str]:
+        key = self.make_key(url, namespace)
+        with self.lock:
+            if key not in self.index:
+                self.load_index()
+            location = self.index.get(key)
+            if location is None:
+                return None
+            try:
+                return self.read_record(*location)
+            except (OSError, zlib.error):
+                # segment 可能剛被 compact 移除，重新載入索引後再試一次
+                self.load_index()
+                location = self.index.get(key)
+                return self.read_record(*location) if location else None
+
+    def read_record(self, segment_id: int, offset: int, length: int) -> str:
+        with open(self.segment_path(segment_id), 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode('utf-8')
+
+    def put(self, url: str, content: str, namespace: str = '') -> None:
+        key = self.make_key(url, namespace)
+        blob = zlib.compress(content.encode('utf-8'), 6)
+        with self.lock, self.file_lock():
+            # 持有檔案鎖後才重新載入索引，其他行程的附加或 compact 都已完成
+            self.load_index()
+            segment_id = self.active_segment()
+            with open(self.segment_path(segment_id), 'ab') as f:
+                offset = f.tell()
+                f.write(blob)
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_RECORD.pack(key, segment_id, offset, len(blob)))
+            self.index[key] = (segment_id, offset, len(blob))
+            self.index_size += INDEX_RECORD.size
+            self.index_inode = self.index_path.stat().st_ino
+
+    def items(self) -> Iterator[Tuple[bytes, str]]:
+        with self.lock:
+            self.load_index()
+            locations = dict(self.index)
+        for key, location in locations.items():
+            yield key, self.read_record(*location)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            self.load_index()
+            segments = list(self.store_dir.glob("segment_*.dat"))
+            total_bytes = sum(path.stat().st_size for path in segments)
+            live_bytes = sum(length for _, _, length in self.index.values())
+            return {
+                "records": len(self.index),
+                "index_records": self.index_size // INDEX_RECORD.size,
+                "segments": len(segments),
+                "total_bytes": total_bytes,
+                "live_bytes": live_bytes,
+            }
+
+    def compact(self) -> Dict:
+        """只保留每個鍵最新的一筆，重寫成新的 segment 與索引，再刪除舊 segment"""
+        with self.lock, self.file_lock():
+            self.load_index()
+            before = self.stats()
+            old_segments = sorted(self.store_dir.glob("segment_*.dat"))
+            next_id = max([int(path.stem.split('_')[1]) for path in old_segments], default=-1) + 1
+
+            new_index: Dict[bytes, Tuple[int, int, int]] = {}
+            tmp_index_path = self.index_path.with_suffix('.bin.tmp')
+            segment_id, segment_file = next_id, None
+            with open(tmp_index_path, 'wb') as index_file:
+                for key, (old_segment, old_offset, length) in sorted(self.index.items(), key=lambda item: item[1]):
+                    with open(self.segment_path(old_segment), 'rb') as f:
+                        f.seek(old_offset)
+                        blob = f.read(length)
+                    if segment_file is None or segment_file.tell() >= SEGMENT_MAX_BYTES:
+                        if segment_file is not None:
+                            segment_file.close()
+                            segment_id += 1
+                        segment_file = open(self.segment_path(segment_id), 'wb')
+                    offset = segment_file.tell()
+                    segment_file.write(blob)
+                    index_file.write(INDEX_RECORD.pack(key, segment_id, offset, length))
+                    new_index[key] = (segment_id, offset, length)
+            if segment_file is not None:
+                segment_file.close()
+
+            os.replace(tmp_index_path, self.index_path)
+            for path in old_segments:
+                path.unlink()
+            self.index = new_index
+            self.index_size = len(new_index) * INDEX_RECORD.size
+            self.index_inode = self.index_path.stat().st_ino
+
+            after = self.stats()
+            logger.info(
+                f"內容庫壓縮完成：{before['index_records']} -> {after['index_records']} 筆索引，"
+                f"{before['total_bytes']} -> {after['total_bytes']} bytes"
+            )
+            return after
+
+_store: Optional[ContentStore] = None
+_store_lock = threading.Lock()
+
+def get_content_store() -> ContentStore:
+    """取得整個行程共用的內容庫實例，避免多個實例同時附加寫入"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContentStore()
+        return _store
+
+def read_content(url: str, legacy_file: Optional[Path] = None) -> Optional[str]:
+    """
+    從內容庫讀取文章內容；找不到時讀取舊版的單檔 .txt 並匯入內容庫。
+
+    Args:
+        url (str): 文章 URL。
+        legacy_file (Optional[Path]): 舊版 data/news_content 下的內容檔路徑。
+
+    Returns:
+        Optional[str]: 文章內容，找不到時為 None。
+    """
+    store = get_content_store()
+    content = store.get(url)
+    if content is None and legacy_file is not None and Path(legacy_file).exists():
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        store.put(url, content)
+    return content
+
+def main():
+    parser = argparse.ArgumentParser(description="管理打包的文章內容庫")
+    parser.add_argument('command', choices=['stats', 'compact'], help='stats：顯示統計；compact：回收舊版本佔用的空間')
+    args = parser.parse_args()
+
+    store = get_content_store()
+    if args.command == 'compact':
+        store.compact()
+    for key, value in store.stats().items():
+        logger.info(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+class FeedState:
+    """保存單一訂閱源在多次輪詢之間需要保留的狀態（ETag / Last-Modified 等）"""
+
+    def __init__(self, source: str, feed_name: str, state_dir: Path = Path("./data/feed_state")):
+        self.path = Path(state_dir) / f"{source}_{feed_name}.json"
+        self.data: Dict = self.load()
+
+    def load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"讀取訂閱源狀態失敗，將重新建立：{self.path} - {e}")
+            return {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.data.get('etag')
+
+    @property
+    def modified(self) -> Optional[str]:
+        return self.data.get('modified')
+
+    def update_validators(self, etag: Optional[str], modified: Optional[str]) -> None:
+        self.data['etag'] = etag
+        self.data['modified'] = modified
+
+    def is_caught_up(self, revisions: Dict[str, Optional[float]]) -> bool:
+        """
+        訂閱源中的每一則都已處理過，且沒有任何一則的修訂時間比上次處理時更新。
+
+        revisions 為 guid 對應 max(published_ts, updated_ts)，沒有時間的項目為 None。
+        """
+        stored = self.data.get('revisions')
+        if not stored:
+            return False
+        for guid, revision in revisions.items():
+            if guid not in stored:
+                return False
+            if revision is not None and revision > (stored[guid] or 0):
+                return False
+        return True
+
+    def update_watermark(self, revisions: Dict[str, Optional[float]]) -> None:
+        """記錄本次成功處理的每一則的修訂時間；已不在訂閱源中的項目一併移除"""
+        stored = self.data.get('revisions') or {}
+        self.data['revisions'] = {
+            guid: max(revision, stored.get(guid) or 0) if revision is not None else stored.get(guid)
+            for guid, revision in revisions.items()
+        }
+        # 舊版只記錄整個訂閱源的水位線
+        self.data.pop('seen_ids', None)
+        self.data.pop('latest_published', None)
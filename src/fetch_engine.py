@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+FETCH_CONFIG_PATH = Path("./src/config/fetch_limits.yaml")
+
+class TokenBucket:
+    """
+    執行緒安全的 token bucket。
+
+    acquire 會阻塞直到取得一個 token；排程器改用不阻塞的 delay 與 take。
+    take 允許 token 變成負數（預支），之後的請求會等待更久，平均速率不變。
+    """
+
+    def __init__(self, calls_per_minute: float, burst: int = 1):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """距離可以取得一個 token 還要幾秒，0 表示現在就可以"""
+        with self.lock:
+            self.refill()
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+class FetchJob:
+    def __init__(self, func: Callable, item, host: str):
+        self.func = func
+        self.item = item
+        self.host = host
+        self.future: Future = Future()
+
+class FetchEngine:
+    """
+    依上游主機分流限速的爬取引擎。
+
+    每個上游主機各有一個 token bucket，另外所有請求共用閘道（r.jina.ai）的 bucket；
+    請求透過共用的 requests.Session 重複使用 keep-alive 連線。
+
+    map 的項目依主機排入各自的佇列，由單一排程執行緒在主機與閘道都有 token、
+    且有空閒工作執行緒時才送進執行緒池，工作執行緒不會停在限速上等待。
+    所有 map 呼叫（例如 Poster 同時處理的多個訂閱源）共用同一組佇列，依主機輪流派送，
+    因此整體吞吐量會隨不同主機的數量成長，而不是被單一主機的積壓卡住。
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        self.default_limit = config.get('default', {'calls_per_minute': 20, 'burst': 3})
+        self.host_limits: Dict[str, Dict] = config.get('hosts') or {}
+        self.timeout = config.get('timeout', 100)
+        self.max_workers = config.get('max_workers', 16)
+
+        gateway = config.get('gateway')
+        self.gateway_host = gateway.get('host') if gateway else None
+        self.gateway_bucket = TokenBucket(gateway['calls_per_minute'], gateway.get('burst', 1)) if gateway else None
+
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.buckets_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+
+        # 排程狀態：主機 -> 待派送的工作，hosts 決定輪流的順序
+        self.queues: Dict[str, deque] = {}
+        self.hosts: deque = deque()
+        self.inflight = 0
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.scheduler = threading.Thread(target=self.schedule_loop, name="fetch-scheduler", daemon=True)
+        self.scheduler.start()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        host = (urlsplit(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def get_limit(self, host: str) -> Dict:
+        # 子網域套用父網域的設定，例如 feeds.bbci.co.uk -> bbci.co.uk
+        parts = host.split('.')
+        for i in range(len(parts) - 1):
+            limit = self.host_limits.get('.'.join(parts[i:]))
+            if limit:
+                return limit
+        return self.default_limit
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self.buckets_lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                limit = self.get_limit(host)
+                bucket = TokenBucket(limit['calls_per_minute'], limit.get('burst', 1))
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire_tokens(self, url: str, upstream_url: Optional[str] = None) -> None:
+        buckets = [self.get_bucket(self.get_host(upstream_url or url))]
+        if self.gateway_bucket and self.get_host(url) == self.gateway_host:
+            buckets.append(self.gateway_bucket)
+
+        if getattr(self.local, 'prepaid', False):
+            # 排程器派送工作前已取得這次請求的 token
+            self.local.prepaid = False
+        elif getattr(self.local, 'scheduled', False):
+            # 同一工作內的重試不在工作執行緒內等待，改為預支 token，由之後的派送補足等待
+            for bucket in buckets:
+                bucket.take()
+        else:
+            for bucket in buckets:
+                bucket.acquire()
+
+    def get(self, url: str, upstream_url: Optional[str] = None, **kwargs) -> requests.Response:
+        """
+        在取得上游主機與閘道的 token 後送出 GET 請求，失敗時拋出 requests.RequestException。
+
+        在 map 派送的工作中呼叫時不會等待限速；其他情況下會阻塞到取得 token。
+        """
+        self.acquire_tokens(url, upstream_url)
+        response = self.send(url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def send(self, url: str, **kwargs) -> requests.Response:
+        """直接送出 GET 請求，不經限速也不檢查狀態碼；呼叫端需先呼叫 acquire_tokens"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def next_job(self) -> Tuple[Optional[FetchJob], Optional[float]]:
+        """
+        依主機輪流挑出一個主機與閘道都有 token 的工作並扣除 token。
+
+        沒有可派送的工作時回傳 (None, 需要等待的秒數)，沒有任何待派送工作或沒有空閒執行緒時秒數為 None。
+        """
+        if not self.hosts or self.inflight >= self.max_workers:
+            return None, None
+        gateway_delay = self.gateway_bucket.delay() if self.gateway_bucket else 0.0
+        min_delay = None
+        for _ in range(len(self.hosts)):
+            host = self.hosts[0]
+            self.hosts.rotate(-1)
+            bucket = self.get_bucket(host)
+            delay = max(bucket.delay(), gateway_delay)
+            if delay > 0:
+                min_delay = delay if min_delay is None else min(min_delay, delay)
+                continue
+            bucket.take()
+            if self.gateway_bucket:
+                self.gateway_bucket.take()
+            queue = self.queues[host]
+            job = queue.popleft()
+            if not queue:
+                del self.queues[host]
+                self.hosts.remove(host)
+            return job, None
+        return None, min_delay
+
+    def schedule_loop(self) -> None:
+        while True:
+            with self.condition:
+                job, delay = self.next_job()
+                while job is None:
+                    self.condition.wait(timeout=delay)
+                    job, delay = self.next_job()
+                self.inflight += 1
+            self.executor.submit(self.run_job, job)
+
+    def run_job(self, job: FetchJob) -> None:
+        self.local.scheduled = True
+        self.local.prepaid = True
+        try:
+            job.future.set_result(job.func(job.item))
+        except Exception as e:
+            job.future.set_exception(e)
+        finally:
+            self.local.scheduled = False
+            self.local.prepaid = False
+            with self.condition:
+                self.inflight -= 1
+                self.condition.notify()
+
+    def map(self, func: Callable, items: Iterable, url_of: Callable[[object], str]) -> List:
+        """
+        並行地對每個項目呼叫 func，項目依主機排入排程器的佇列，主機之間輪流派送。
+        func 內第一個經由 get 送出的請求使用派送時取得的 token。
+        回傳結果與輸入順序相同；個別項目失敗時結果為 None。
+        """
+        items = list(items)
+        jobs = [FetchJob(func, item, self.get_host(url_of(item))) for item in items]
+        with self.condition:
+            for job in jobs:
+                if job.host not in self.queues:
+                    self.queues[job.host] = deque()
+                    self.hosts.append(job.host)
+                self.queues[job.host].append(job)
+            self.condition.notify()
+        wait([job.future for job in jobs])
+
+        results = []
+        for item, job in zip(items, jobs):
+            try:
+                results.append(job.future.result())
+            except Exception as e:
+                logger.error(f"爬取時發生未預期的錯誤：{url_of(item)} - {e}")
+                results.append(None)
+        return results
+
+def load_fetch_config(config_path: Path = FETCH_CONFIG_PATH) -> Dict:
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"載入爬取設定失敗，使用預設值：{e}")
+        return {}
+
+_engine: Optional[FetchEngine] = None
+_engine_lock = threading.Lock()
+
+def get_fetch_engine() -> FetchEngine:
+    """取得整個行程共用的爬取引擎，讓同一主機的限速在所有訂閱源之間共享"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine(load_fetch_config())
+        return _engine
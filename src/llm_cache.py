@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from openai.types.chat import ChatCompletion
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+LLM_CACHE_PATH = Path("./data/cache/llm_cache.sqlite")
+
+class LLMCache:
+    """
+    以 SQLite 保存的 LLM 回應快取，供所有流程階段共用。
+
+    鍵由模型、提示內容（含模板展開後的文字）、工具 schema 與其他參數組成，
+    任一項改變都會得到新的鍵。開啟時與每寫入 evict_every 筆時依存活時間與總大小
+    （最久未使用者優先）淘汰，並依階段統計命中與未命中次數。
+    """
+
+    def __init__(self, db_path: Path = LLM_CACHE_PATH, max_age_days: float = 30, max_size_mb: float = 200,
+                 bypass: bool = False, evict_every: int = 100):
+        self.db_path = Path(db_path)
+        self.max_age = max_age_days * 86400
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        # 也可以用環境變數暫時停用快取，例如重新產生所有摘要時
+        self.bypass = bypass or os.environ.get('LLM_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        # 長時間執行的行程（poster 迴圈、多 feed 的流程）每寫入 evict_every 筆就淘汰一次
+        self.evict_every = max(1, evict_every)
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+        self.evict()
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite3 連線不能跨執行緒使用，每個執行緒各自一條
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, stage: str, key: str, accept: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """accept 回傳 False 的快取內容（例如舊版本存下的失敗回應）視為未命中"""
+        if self.bypass:
+            self.record(stage, hit=False)
+            return None
+        conn = self.connect()
+        row = conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age or (accept is not None and not accept(row[0])):
+            self.record(stage, hit=False)
+            return None
+        with conn:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.record(stage, hit=True)
+        return row[0]
+
+    def put(self, stage: str, key: str, response: str) -> None:
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stage, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, response, len(response.encode('utf-8')), now, now),
+            )
+        with self.lock:
+            self.writes += 1
+            due = self.writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def record(self, stage: str, hit: bool) -> None:
+        with self.lock:
+            self.stats[stage]['hits' if hit else 'misses'] += 1
+
+    def evict(self) -> None:
+        """刪除過期的回應，總大小超過上限時再刪除最久未使用的回應"""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total_size <= self.max_size:
+                return
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+            evicted = []
+            for key, size in rows:
+                if total_size <= self.max_size:
+                    break
+                evicted.append((key,))
+                total_size -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            logger.info(f"LLM 快取超過大小上限，已淘汰 {len(evicted)} 筆回應")
+
+    @staticmethod
+    def is_cacheable(response: ChatCompletion, request: Dict[str, Any],
+                     validate: Optional[Callable[[ChatCompletion], bool]] = None) -> bool:
+        """
+        只快取完整且可用的回應：finish_reason 為 stop 或 tool_calls，
+        請求帶有 tools 時必須有工具呼叫，並通過呼叫端的 validate。
+        """
+        if not response.choices:
+            return False
+        choice = response.choices[0]
+        if choice.finish_reason not in ('stop', 'tool_calls'):
+            return False
+        if request.get('tools') and not choice.message.tool_calls:
+            return False
+        if validate is None:
+            return True
+        try:
+            return bool(validate(response))
+        except Exception:
+            return False
+
+    def chat_completion(self, client, stage: str, validate: Optional[Callable[[ChatCompletion], bool]] = None,
+                        refresh: bool = False, **kwargs) -> ChatCompletion:
+        """
+        帶快取的 client.chat.completions.create。
+
+        Args:
+            client: OpenAI client。
+            stage (str): 呼叫所屬的流程階段，用於統計命中率。
+            validate: 檢查回應能否被呼叫端解析，回傳 False 或拋出例外的回應不寫入快取。
+            refresh (bool): 不讀取快取、一律呼叫 API，成功的回應仍會更新快取。
+            **kwargs: 傳給 chat.completions.create 的參數。
+
+        Returns:
+            ChatCompletion: 快取命中時由保存的 JSON 還原，否則為實際的 API 回應。
+        """
+        key = self.make_key(kwargs)
+
+        def accept(raw: str) -> bool:
+            try:
+                return self.is_cacheable(ChatCompletion.model_validate_json(raw), kwargs, validate)
+            except Exception:
+                return False
+
+        if refresh:
+            self.record(stage, hit=False)
+        else:
+            cached = self.get(stage, key, accept=accept)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+
+        response = client.chat.completions.create(**kwargs)
+        if not self.is_cacheable(response, kwargs, validate):
+            logger.warning(f"LLM 回應不完整或無法解析，不寫入快取 [{stage}]")
+            return response
+        try:
+            self.put(stage, key, response.model_dump_json())
+        except Exception as e:
+            logger.warning(f"寫入 LLM 快取失敗：{e}")
+        return response
+
+    def stream_chat_completion(self, client, stage: str, on_text: Callable[[str], None], **kwargs) -> str:
+        """
+        帶快取的串流呼叫，每收到一段文字就交給 on_text。
+
+        快取命中時一次交出完整內容；未命中時以 stream=True 呼叫，結束後把組合好的回應
+        以 ChatCompletion 格式存入快取，與非串流呼叫共用同一個鍵。
+
+        Returns:
+            str: 完整的回應內容。
+        """
+        key = self.make_key(kwargs)
+        cached = self.get(stage, key)
+        if cached is not None:
+            content = ChatCompletion.model_validate_json(cached).choices[0].message.content or ''
+            on_text(content)
+            return content
+
+        parts = []
+        last_chunk, finish_reason = None, None
+        for chunk in client.chat.completions.create(stream=True, **kwargs):
+            last_chunk = chunk
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if delta:
+                parts.append(delta)
+                on_text(delta)
+        content = ''.join(parts)
+
+        if last_chunk is not None and finish_reason == 'stop':
+            try:
+                response = ChatCompletion.model_validate({
+                    "id": last_chunk.id,
+                    "object": "chat.completion",
+                    "created": last_chunk.created,
+                    "model": last_chunk.model,
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": finish_reason,
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                })
+                self.put(stage, key, response.model_dump_json())
+            except Exception as e:
+                logger.warning(f"寫入 LLM 快取失敗：{e}")
+        return content
+
+    def log_stats(self) -> None:
+        with self.lock:
+            stats = {stage: dict(counts) for stage, counts in self.stats.items()}
+        if not stats:
+            return
+        logger.info("LLM 快取統計：" + ("（已停用）" if self.bypass else ""))
+        for stage, counts in sorted(stats.items()):
+            total = counts['hits'] + counts['misses']
+            logger.info(f"  - {stage}: 命中 {counts['hits']} / 未命中 {counts['misses']}（命中率 {counts['hits'] / total:.0%}）")
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    """取得整個行程共用的 LLM 快取"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
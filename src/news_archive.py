@@ -0,0 +1,177 @@
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+ARCHIVE_DIR = Path("./data/archive")
+
+# 分區欄位固定為字串，避免 pyarrow 自動把日期推斷成其他型別
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string()), ('source', pa.string())]), flavor='hive')
+
+# 檔案內的欄位；source 與 date 由分區目錄表示
+FILE_SCHEMA = pa.schema([
+    ('feed', pa.string()),
+    ('title', pa.string()),
+    ('summary', pa.string()),
+    ('link', pa.string()),
+    ('guid', pa.string()),
+    ('published', pa.string()),
+    ('published_ts', pa.float64()),
+    ('updated_ts', pa.float64()),
+    ('ai_title', pa.string()),
+    ('ai_summary', pa.string()),
+    ('content_hash', pa.string()),
+    ('archived_at', pa.float64()),
+])
+DATASET_SCHEMA = pa.schema(list(FILE_SCHEMA) + list(PARTITIONING.schema))
+ARCHIVE_COLUMNS = DATASET_SCHEMA.names
+
+class NewsArchive:
+    """
+    把處理完成的新聞附加寫入依日期與來源分區的 Parquet 資料集（data/archive/date=.../source=.../）。
+
+    每次附加寫成一個小檔，查詢時利用分區與欄位投影只讀需要的資料；
+    compact 會把同一分區的小檔合併成一個檔，並只保留每篇文章最新的一筆。
+    """
+
+    def __init__(self, archive_dir: Path = ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+
+    @staticmethod
+    def partition_date(published_ts, archived_at: float) -> str:
+        ts = archived_at if published_ts is None or pd.isna(published_ts) else float(published_ts)
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
+
+    def append(self, source: str, feed: str, data_frame: pd.DataFrame) -> int:
+        """附加一批新聞，回傳寫入的列數"""
+        if data_frame.empty:
+            return 0
+        archived_at = time.time()
+        records = data_frame.reindex(columns=FILE_SCHEMA.names).copy()
+        records['feed'] = feed
+        records['archived_at'] = archived_at
+        dates = records['published_ts'].map(lambda ts: self.partition_date(ts, archived_at))
+
+        for date, part in records.groupby(dates):
+            self.write_file(date, source, part)
+        logger.info(f"已封存 {len(records)} 則新聞：{source}_{feed}")
+        return len(records)
+
+    def partition_dir(self, date: str, source: str) -> Path:
+        return self.archive_dir / f"date={date}" / f"source={source}"
+
+    def write_file(self, date: str, source: str, data_frame: pd.DataFrame, name: Optional[str] = None) -> Path:
+        partition_dir = self.partition_dir(date, source)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        name = name or f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        path = partition_dir / name
+        # 分區欄位由目錄名稱表示，不寫進檔案
+        table = pa.Table.from_pandas(data_frame.reindex(columns=FILE_SCHEMA.names), schema=FILE_SCHEMA, preserve_index=False)
+        # 以 . 開頭的暫存檔不會被資料集掃描到
+        tmp_path = path.with_name(f".{name}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd')
+        tmp_path.replace(path)
+        return path
+
+    def dataset(self) -> Optional[ds.Dataset]:
+        if not any(self.archive_dir.glob("date=*/source=*/*.parquet")):
+            return None
+        return ds.dataset(self.archive_dir, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+    def query(self, columns: Optional[List[str]] = None, source: Optional[str] = None, feed: Optional[str] = None,
+              start_date: Optional[str] = None, end_date: Optional[str] = None, link: Optional[str] = None) -> pd.DataFrame:
+        """
+        查詢封存的新聞。
+
+        日期與來源條件只會讀取符合的分區目錄，feed / link 條件下推到 Parquet 掃描，
+        columns 只讀取需要的欄位。
+
+        Args:
+            columns (Optional[List[str]]): 要讀取的欄位，預設為全部。
+            source (Optional[str]): 新聞來源。
+            feed (Optional[str]): 訂閱源名稱。
+            start_date (Optional[str]): 起始日期（含），格式 YYYY-MM-DD。
+            end_date (Optional[str]): 結束日期（含），格式 YYYY-MM-DD。
+            link (Optional[str]): 文章 URL。
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+
+        conditions = []
+        if source is not None:
+            conditions.append(ds.field('source') == source)
+        if start_date is not None:
+            conditions.append(ds.field('date') >= start_date)
+        if end_date is not None:
+            conditions.append(ds.field('date') <= end_date)
+        if feed is not None:
+            conditions.append(ds.field('feed') == feed)
+        if link is not None:
+            conditions.append(ds.field('link') == link)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def compact(self, min_files: int = 2) -> int:
+        """合併小檔並去除重複的文章，回傳被合併的分區數"""
+        compacted = 0
+        for partition_dir in sorted(self.archive_dir.glob("date=*/source=*")):
+            files = sorted(partition_dir.glob("*.parquet"))
+            if len(files) < min_files:
+                continue
+            data_frame = pd.concat([pq.read_table(path).to_pandas() for path in files], ignore_index=True)
+            before = len(data_frame)
+            data_frame = data_frame.sort_values('archived_at').drop_duplicates(['feed', 'link'], keep='last')
+            source = partition_dir.name.split('=', 1)[1]
+            date = partition_dir.parent.name.split('=', 1)[1]
+            merged_path = self.write_file(date, source, data_frame, name=f"compacted-{int(time.time() * 1000)}.parquet")
+            for path in files:
+                if path != merged_path:
+                    path.unlink()
+            compacted += 1
+            logger.info(f"已合併 {partition_dir}：{len(files)} 個檔案、{before} -> {len(data_frame)} 列")
+        return compacted
+
+def main():
+    parser = argparse.ArgumentParser(description="查詢或壓縮 Parquet 新聞封存")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    query_parser = subparsers.add_parser('query', help='查詢封存的新聞')
+    query_parser.add_argument('-s', '--source', help='新聞來源')
+    query_parser.add_argument('-f', '--feed', help='訂閱源名稱')
+    query_parser.add_argument('--since', help='起始日期（含），格式 YYYY-MM-DD')
+    query_parser.add_argument('--until', help='結束日期（含），格式 YYYY-MM-DD')
+    query_parser.add_argument('-c', '--columns', nargs='*', default=['date', 'source', 'feed', 'ai_title', 'link'], help='要輸出的欄位')
+    query_parser.add_argument('-o', '--output', help='輸出 CSV 路徑，未指定時直接顯示')
+
+    compact_parser = subparsers.add_parser('compact', help='合併小檔')
+    compact_parser.add_argument('--min-files', type=int, default=2, help='分區內至少有幾個檔案才合併')
+    args = parser.parse_args()
+
+    archive = NewsArchive()
+    if args.command == 'compact':
+        logger.info(f"壓縮完成，共合併 {archive.compact(args.min_files)} 個分區")
+        return
+
+    result = archive.query(columns=args.columns, source=args.source, feed=args.feed,
+                           start_date=args.since, end_date=args.until)
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+        logger.info(f"已輸出 {len(result)} 則新聞至 {args.output}")
+    else:
+        print(result.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
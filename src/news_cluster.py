@@ -0,0 +1,119 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# MinHash 使用的梅森質數與固定種子，讓每次執行的簽章相同；
+# 質數小於 2^31，a * h + b 不會超出 uint64
+MERSENNE_PRIME = (1 << 31) - 1
+MINHASH_SEED = 1
+
+NORMALIZE_PATTERN = re.compile(r'[\W_]+')
+
+def char_shingles(text: str, size: int = 3) -> set:
+    """去除標點與空白後取字元 n-gram，中英文混合的標題與摘要都適用"""
+    text = NORMALIZE_PATTERN.sub('', text.lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+class NewsClusterer:
+    """
+    以 MinHash / LSH 把明顯報導同一事件的新聞聚成候選群組。
+
+    文字為 title、ai_title、ai_summary 的字元 shingle；LSH 找出候選配對後，
+    以簽章估計的 Jaccard 相似度不低於 threshold 的配對才合併。
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 128, bands: int = 32, shingle_size: int = 3):
+        if num_perm % bands:
+            raise ValueError("num_perm 必須是 bands 的倍數")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(MINHASH_SEED)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: set) -> np.ndarray:
+        if not shingles:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64) % MERSENNE_PRIME
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def article_text(record: Dict) -> str:
+        values = (record.get(column) for column in ('title', 'ai_title', 'ai_summary'))
+        return ' '.join(value for value in values if isinstance(value, str))
+
+    def cluster(self, news_df: pd.DataFrame) -> pd.Series:
+        """回傳與 news_df 相同索引的群組編號，同一群組的新聞編號相同"""
+        records = news_df.to_dict(orient='records')
+        signatures = [self.signature(char_shingles(self.article_text(record), self.shingle_size)) for record in records]
+        union_find = UnionFind(len(records))
+
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            buckets: Dict[bytes, List[int]] = defaultdict(list)
+            for i, signature in enumerate(signatures):
+                buckets[signature[start:start + self.rows_per_band].tobytes()].append(i)
+            for members in buckets.values():
+                for other in members[1:]:
+                    if union_find.find(members[0]) == union_find.find(other):
+                        continue
+                    similarity = float(np.mean(signatures[members[0]] == signatures[other]))
+                    if similarity >= self.threshold:
+                        union_find.union(members[0], other)
+
+        labels = pd.Series([union_find.find(i) for i in range(len(records))], index=news_df.index)
+        # 重新編號為 0..n-1，依群組第一次出現的順序
+        return labels.map({label: number for number, label in enumerate(dict.fromkeys(labels))})
+
+    def representatives(self, news_df: pd.DataFrame, labels: pd.Series) -> pd.DataFrame:
+        """
+        每個群組挑一則代表：有摘要者優先，其次取最新的一則。
+
+        回傳的 DataFrame 多了 cluster（群組編號）與 articles（群組內新聞數）兩個欄位。
+        """
+        ranked = news_df.assign(
+            cluster=labels,
+            has_summary=news_df['ai_title'].notna() & (news_df['ai_title'] != '處理失敗') if 'ai_title' in news_df.columns else False,
+            sort_ts=pd.to_numeric(news_df['published_ts'], errors='coerce') if 'published_ts' in news_df.columns else 0,
+        )
+        sizes = ranked.groupby('cluster')['link'].transform('size')
+        ranked['articles'] = sizes
+        ranked = ranked.sort_values(['has_summary', 'sort_ts'], ascending=False, kind='stable')
+        chosen = ranked.drop_duplicates('cluster').sort_values('cluster')
+        return chosen.drop(columns=['has_summary', 'sort_ts'])
+
+    @staticmethod
+    def members(news_df: pd.DataFrame, labels: pd.Series) -> Dict[int, List[str]]:
+        """群組編號對應的所有新聞 link"""
+        grouped: Dict[int, List[str]] = defaultdict(list)
+        for link, label in zip(news_df['link'], labels):
+            if link not in grouped[label]:
+                grouped[label].append(link)
+        return dict(grouped)
@@ -0,0 +1,284 @@
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from src.config.log_config import setup_logger
+from utils.file_utils import atomic_write_csv
+
+logger = setup_logger(__name__)
+
+NEWS_DB_PATH = Path("./data/news.sqlite")
+
+# 訂閱源 CSV 原有的欄位，依原本的欄位順序
+ARTICLE_COLUMNS = [
+    'title', 'summary', 'link', 'guid', 'published', 'published_ts', 'updated_ts',
+    'ai_title', 'ai_summary', 'content_hash',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    source TEXT NOT NULL,
+    feed TEXT NOT NULL,
+    link TEXT NOT NULL,
+    guid TEXT,
+    title TEXT,
+    summary TEXT,
+    published TEXT,
+    published_ts REAL,
+    updated_ts REAL,
+    ai_title TEXT,
+    ai_summary TEXT,
+    content_hash TEXT,
+    in_feed INTEGER NOT NULL DEFAULT 1,
+    chosen INTEGER NOT NULL DEFAULT 0,
+    ai_reason TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source, feed, link)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_link ON articles (link);
+CREATE INDEX IF NOT EXISTS idx_articles_source_feed ON articles (source, feed, in_feed);
+CREATE INDEX IF NOT EXISTS idx_articles_published_ts ON articles (published_ts);
+
+CREATE TABLE IF NOT EXISTS group_tags (
+    run_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    link TEXT NOT NULL,
+    importance_score REAL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, tag, link)
+);
+CREATE INDEX IF NOT EXISTS idx_group_tags_link ON group_tags (link);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (key, kind)
+);
+"""
+
+def to_sql_value(value):
+    """pandas 的 NaN / NaT 轉成 NULL，numpy 數值轉成 Python 型別"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value.item() if hasattr(value, 'item') else value
+
+class NewsDB:
+    """
+    以 SQLite（WAL 模式）保存的新聞資料庫，取代各階段反覆讀寫整份 CSV。
+
+    保存文章與摘要、選中標記、Poster 的分組標籤以及產出檔路徑。WAL 模式下
+    讀取端（Streamlit）與寫入端（Poster）互不阻塞；CSV 改為可選的匯出格式。
+    """
+
+    def __init__(self, db_path: Path = NEWS_DB_PATH):
+        self.db_path = Path(db_path)
+        self.local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        # sqlite3 連線不能跨執行緒使用，每個執行緒各自一條
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def has_feed(self, source: str, feed: str) -> bool:
+        row = self.connect().execute(
+            "SELECT 1 FROM articles WHERE source = ? AND feed = ? LIMIT 1", (source, feed)
+        ).fetchone()
+        return row is not None
+
+    def list_feeds(self, chosen_only: bool = False) -> List[Tuple[str, str]]:
+        query = "SELECT DISTINCT source, feed FROM articles"
+        if chosen_only:
+            query += " WHERE chosen = 1"
+        return [tuple(row) for row in self.connect().execute(query + " ORDER BY source, feed")]
+
+    def save_feed(self, source: str, feed: str, data_frame: pd.DataFrame) -> None:
+        """
+        寫入一個訂閱源本次的所有新聞。
+
+        不在本次訂閱源中的舊新聞保留下來但標記為 in_feed = 0，
+        已有的選中標記不受影響。
+        """
+        now = time.time()
+        rows = [
+            (source, feed, *(to_sql_value(record.get(column)) for column in ARTICLE_COLUMNS), now)
+            for record in data_frame.to_dict(orient='records')
+        ]
+        assignments = ', '.join(f"{column} = excluded.{column}" for column in ARTICLE_COLUMNS if column != 'link')
+        with self.connect() as conn:
+            conn.execute("UPDATE articles SET in_feed = 0 WHERE source = ? AND feed = ?", (source, feed))
+            conn.executemany(
+                f"INSERT INTO articles (source, feed, {', '.join(ARTICLE_COLUMNS)}, updated_at, in_feed) "
+                f"VALUES (?, ?, {', '.join('?' for _ in ARTICLE_COLUMNS)}, ?, 1) "
+                f"ON CONFLICT (source, feed, link) DO UPDATE SET {assignments}, updated_at = excluded.updated_at, in_feed = 1",
+                rows,
+            )
+
+    def update_summaries(self, summaries: Dict[str, Tuple[str, str, Optional[str]]]) -> int:
+        """依 link 更新所有訂閱源中同一篇文章的摘要，回傳更新的列數"""
+        now = time.time()
+        with self.connect() as conn:
+            cursor = conn.executemany(
+                "UPDATE articles SET ai_title = ?, ai_summary = ?, content_hash = COALESCE(?, content_hash), updated_at = ? "
+                "WHERE link = ?",
+                [(ai_title, ai_summary, content_hash, now, link) for link, (ai_title, ai_summary, content_hash) in summaries.items()],
+            )
+            return cursor.rowcount
+
+    def read_pending_summaries(self, feeds: Optional[List[Tuple[str, str]]] = None) -> pd.DataFrame:
+        """仍在訂閱源中、尚未摘要或摘要失敗的新聞，feeds 為 None 時讀取所有訂閱源"""
+        query = (
+            "SELECT source, feed, link, title FROM articles "
+            "WHERE in_feed = 1 AND (ai_title IS NULL OR ai_title = '' OR ai_title = '處理失敗')"
+        )
+        data_frame = pd.read_sql_query(query + " ORDER BY published_ts DESC, rowid", self.connect())
+        if feeds is not None:
+            wanted = set(feeds)
+            data_frame = data_frame[[(source, feed) in wanted for source, feed in zip(data_frame['source'], data_frame['feed'])]]
+        return data_frame
+
+    def read_links(self, links: Iterable[str]) -> pd.DataFrame:
+        """讀取所有訂閱源中這些 link 的新聞，含 source、feed"""
+        links = list(dict.fromkeys(links))
+        frames = []
+        # 分批查詢，避免超過 SQLite 的參數數量上限
+        for start in range(0, len(links), 500):
+            chunk = links[start:start + 500]
+            frames.append(pd.read_sql_query(
+                f"SELECT {', '.join(ARTICLE_COLUMNS + ['source', 'feed'])} FROM articles "
+                f"WHERE link IN ({', '.join('?' * len(chunk))})",
+                self.connect(), params=chunk,
+            ))
+        if not frames:
+            return pd.DataFrame(columns=ARTICLE_COLUMNS + ['source', 'feed'])
+        return pd.concat(frames, ignore_index=True)
+
+    def read_articles(self, source: Optional[str] = None, feed: Optional[str] = None, current_only: bool = True,
+                      since_ts: Optional[float] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        讀取文章。
+
+        Args:
+            source (Optional[str]): 只讀取此來源。
+            feed (Optional[str]): 只讀取此訂閱源。
+            current_only (bool): 只讀取仍在訂閱源中的新聞（與訂閱源 CSV 的內容相同）。
+            since_ts (Optional[float]): 只讀取發布時間不早於此時間戳的新聞。
+            columns (Optional[List[str]]): 要讀取的欄位，預設為訂閱源 CSV 的欄位加上 source、feed。
+        """
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if feed is not None:
+            conditions.append("feed = ?")
+            params.append(feed)
+        if current_only:
+            conditions.append("in_feed = 1")
+        if since_ts is not None:
+            conditions.append("published_ts >= ?")
+            params.append(since_ts)
+        selected = columns or ARTICLE_COLUMNS + ['source', 'feed']
+        query = f"SELECT {', '.join(selected)} FROM articles"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return pd.read_sql_query(query + " ORDER BY published_ts DESC, rowid", self.connect(), params=params)
+
+    def set_chosen(self, source: str, feed: str, reasons: Dict[str, str]) -> None:
+        """以本次選出的新聞取代該訂閱源先前的選中標記"""
+        with self.connect() as conn:
+            conn.execute("UPDATE articles SET chosen = 0, ai_reason = NULL WHERE source = ? AND feed = ? AND chosen = 1",
+                         (source, feed))
+            conn.executemany(
+                "UPDATE articles SET chosen = 1, ai_reason = ? WHERE source = ? AND feed = ? AND link = ?",
+                [(reason, source, feed, link) for link, reason in reasons.items()],
+            )
+
+    def read_chosen(self, source: str, feed: str) -> pd.DataFrame:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(ARTICLE_COLUMNS)}, ai_reason FROM articles "
+            "WHERE source = ? AND feed = ? AND chosen = 1 ORDER BY published_ts DESC, rowid",
+            self.connect(), params=(source, feed),
+        )
+
+    def save_group_tags(self, run_id: str, groups: Iterable[Dict]) -> None:
+        now = time.time()
+        rows = [
+            (run_id, group['tag'], link, group.get('importance_score'), now)
+            for group in groups for link in group['links']
+        ]
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO group_tags (run_id, tag, link, importance_score, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def read_group_tags(self, run_id: Optional[str] = None) -> pd.DataFrame:
+        if run_id is None:
+            row = self.connect().execute("SELECT MAX(run_id) FROM group_tags").fetchone()
+            run_id = row[0]
+        return pd.read_sql_query(
+            "SELECT link, tag, importance_score FROM group_tags WHERE run_id = ? ORDER BY rowid",
+            self.connect(), params=(run_id,),
+        )
+
+    def put_artifact(self, key: str, kind: str, path) -> None:
+        """記錄產出檔的路徑，key 為文章 link 或 Poster 的執行編號"""
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, kind, path, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, str(path), time.time()),
+            )
+
+    def get_artifact(self, key: str, kind: str) -> Optional[str]:
+        row = self.connect().execute("SELECT path FROM artifacts WHERE key = ? AND kind = ?", (key, kind)).fetchone()
+        return row[0] if row else None
+
+    def export_csv(self, source: str, feed: str, path: Path, chosen_only: bool = False) -> int:
+        """把一個訂閱源匯出成與舊版相同格式的 CSV，回傳匯出的列數"""
+        data_frame = self.read_chosen(source, feed) if chosen_only else \
+            self.read_articles(source, feed, columns=ARTICLE_COLUMNS)
+        atomic_write_csv(data_frame, path, encoding='utf-8-sig')
+        return len(data_frame)
+
+_db: Optional[NewsDB] = None
+_db_lock = threading.Lock()
+
+def get_news_db() -> NewsDB:
+    """取得整個行程共用的新聞資料庫"""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = NewsDB()
+        return _db
+
+def main():
+    parser = argparse.ArgumentParser(description="把新聞資料庫匯出成 CSV")
+    parser.add_argument('-o', '--output-dir', default='./data/news', help='匯出目錄')
+    parser.add_argument('--chosen', action='store_true', help='只匯出選中的新聞')
+    args = parser.parse_args()
+
+    db = get_news_db()
+    for source, feed in db.list_feeds(chosen_only=args.chosen):
+        path = Path(args.output_dir) / f"{source}_{feed}.csv"
+        count = db.export_csv(source, feed, path, chosen_only=args.chosen)
+        logger.info(f"已匯出 {count} 則新聞至 {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.ai_broadcast import AIBroadcast
+from src.ai_chose import AIChose
+from src.ai_news import AINews
+from src.ai_rewrite import AIRewrite
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# 上游所有工作執行緒結束後，每個下游工作執行緒各收到一個 STOP
+STOP = object()
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    failed: int = 0
+    emitted: int = 0
+    busy_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+    depth_total: int = 0
+    depth_samples: int = 0
+    max_depth: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_depth(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+@dataclass
+class Stage:
+    """
+    流程中的一個階段。
+
+    handler 接收一個項目，回傳（或 yield）要交給下一階段的項目；最後一個階段的輸出會被丟棄。
+    同一階段的 workers 個執行緒從同一個有上限的佇列取件，佇列滿時上游會等待。
+    """
+    name: str
+    handler: Callable[[object], Optional[Iterable]]
+    workers: int = 1
+    queue_size: int = 8
+    inbox: queue.Queue = field(init=False)
+    stats: StageStats = field(init=False, default_factory=StageStats)
+
+    def __post_init__(self):
+        self.workers = max(1, self.workers)
+        self.inbox = queue.Queue(maxsize=max(1, self.queue_size))
+
+class Pipeline:
+    """
+    以有上限的行程內佇列串接各階段，上游產出第一個項目後下游即可開始處理。
+
+    單一項目失敗只記錄錯誤並計入 failed，不中斷其他項目。
+    """
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("Pipeline 至少需要一個階段")
+        self.stages = stages
+        self.lock = threading.Lock()
+        self.remaining_workers: Dict[str, int] = {}
+
+    def put(self, stage: Stage, target: Stage, item) -> None:
+        start = time.perf_counter()
+        target.inbox.put(item)
+        with self.lock:
+            stage.stats.blocked_seconds += time.perf_counter() - start
+            stage.stats.emitted += 1
+
+    def worker(self, index: int) -> None:
+        stage = self.stages[index]
+        target = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            depth = stage.inbox.qsize()
+            item = stage.inbox.get()
+            if item is STOP:
+                break
+            with self.lock:
+                stats = stage.stats
+                stats.depth_total += depth
+                stats.depth_samples += 1
+                stats.max_depth = max(stats.max_depth, depth)
+                if stats.started_at is None:
+                    stats.started_at = time.time()
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                for output in stage.handler(item) or ():
+                    if target is not None:
+                        self.put(stage, target, output)
+            except Exception as e:
+                failed = True
+                logger.error(f"流程階段 {stage.name} 處理失敗：{e}")
+            with self.lock:
+                stage.stats.busy_seconds += time.perf_counter() - start
+                stage.stats.processed += 1
+                stage.stats.failed += int(failed)
+                stage.stats.finished_at = time.time()
+
+        with self.lock:
+            self.remaining_workers[stage.name] -= 1
+            last_worker = self.remaining_workers[stage.name] == 0
+        if last_worker and target is not None:
+            for _ in range(target.workers):
+                target.inbox.put(STOP)
+
+    def run(self, items: Iterable) -> Dict[str, StageStats]:
+        threads = []
+        for index, stage in enumerate(self.stages):
+            self.remaining_workers[stage.name] = stage.workers
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self.worker, args=(index,), name=f"{stage.name}-{number}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        for item in items:
+            first.inbox.put(item)
+        for _ in range(first.workers):
+            first.inbox.put(STOP)
+
+        for thread in threads:
+            thread.join()
+        return {stage.name: stage.stats for stage in self.stages}
+
+    def log_stats(self) -> None:
+        logger.info("流程階段統計：")
+        for stage in self.stages:
+            stats = stage.stats
+            logger.info(
+                f"  - {stage.name}（{stage.workers} 執行緒）：處理 {stats.processed} 件（失敗 {stats.failed}）、"
+                f"輸出 {stats.emitted} 件，{stats.throughput:.2f} 件/秒，"
+                f"處理 {stats.busy_seconds:.1f}s / 等待下游 {stats.blocked_seconds:.1f}s，"
+                f"佇列深度平均 {stats.mean_depth:.1f}、最大 {stats.max_depth}（上限 {stage.inbox.maxsize}）"
+            )
+
+class NewsPipeline:
+    """
+    新聞處理流程：爬取摘要 → 選擇 → 改寫 → 語音，可一次處理多個 feed。
+
+    爬取與選擇以 feed 為單位；選出的新聞逐則送往改寫，改寫好的腳本逐則送往語音合成，
+    不必等整個 feed 完成。
+    """
+
+    def __init__(self, num_chosen: int = 5, voice: str = "nova", feed_workers: int = 2, rewrite_workers: int = 4,
+                 tts_workers: int = 2, queue_size: int = 8, bulletin: bool = False):
+        self.num_chosen = num_chosen
+        self.voice = voice
+        self.bulletin = bulletin
+        self.lock = threading.Lock()
+        self.ai_rewrite = None
+        self.rewrite_feeds: Dict[Tuple[str, str], tuple] = {}
+        self.broadcasts: Dict[Tuple[str, str], Tuple[AIBroadcast, Dict]] = {}
+        # 本次各 feed 選出的新聞，每日快報只收錄這些
+        self.chosen: Dict[Tuple[str, str], List[Dict]] = {}
+        self.pipeline = Pipeline([
+            Stage("news", self.fetch_feed, workers=feed_workers, queue_size=queue_size),
+            Stage("chose", self.choose_news, workers=feed_workers, queue_size=queue_size),
+            Stage("rewrite", self.rewrite_item, workers=rewrite_workers, queue_size=queue_size),
+            Stage("broadcast", self.broadcast_item, workers=tts_workers, queue_size=queue_size),
+        ])
+
+    def fetch_feed(self, feed: Dict):
+        logger.info(f"開始處理新聞數據：{feed['source']}_{feed['feed_name']}")
+        AINews(feed['rss_url'], feed['source'], feed['feed_name']).run()
+        yield feed
+
+    def choose_news(self, feed: Dict):
+        chosen_df = AIChose(feed['source'], feed['feed_name'], self.num_chosen).run()
+        if chosen_df is None:
+            return
+        with self.lock:
+            self.chosen[(feed['source'], feed['feed_name'])] = chosen_df.to_dict(orient='records')
+        for position, row in enumerate(chosen_df.to_dict(orient='records')):
+            yield {**feed, 'position': position, 'row': row}
+
+    def get_rewrite_feed(self, source: str, feed_name: str) -> tuple:
+        with self.lock:
+            if self.ai_rewrite is None:
+                self.ai_rewrite = AIRewrite()
+            key = (source, feed_name)
+            if key not in self.rewrite_feeds:
+                self.rewrite_feeds[key] = self.ai_rewrite.open_feed(source, feed_name)
+            return self.rewrite_feeds[key]
+
+    def rewrite_item(self, item: Dict):
+        context = self.get_rewrite_feed(item['source'], item['feed_name'])
+        status = self.ai_rewrite.rewrite_row(item['position'], item['row'], *context)
+        if status in ('rewritten', 'skipped'):
+            yield {**item, 'file': self.ai_rewrite.get_safe_filename(item['row']['link'])}
+
+    def get_broadcast(self, source: str, feed_name: str) -> Tuple[AIBroadcast, Dict]:
+        with self.lock:
+            key = (source, feed_name)
+            if key not in self.broadcasts:
+                ai_broadcast = AIBroadcast(source, feed_name, self.voice)
+                ai_broadcast.output_folder.mkdir(parents=True, exist_ok=True)
+                self.broadcasts[key] = (ai_broadcast, ai_broadcast.load_manifest())
+            return self.broadcasts[key]
+
+    def broadcast_item(self, item: Dict):
+        ai_broadcast, manifest = self.get_broadcast(item['source'], item['feed_name'])
+        with open(ai_broadcast.input_folder / item['file'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        ai_broadcast.broadcast_script({'file': item['file'], 'title': item['row']['title'], 'text': text}, manifest)
+        return None
+
+    def finish(self) -> None:
+        # 改寫時跳過的腳本只更新了記憶體中的順序與標題，結束時一併寫回
+        for content_folder, output_folder, manifest, manifest_path in self.rewrite_feeds.values():
+            self.ai_rewrite.save_manifest(manifest_path, manifest)
+        if self.bulletin:
+            for key, (ai_broadcast, manifest) in self.broadcasts.items():
+                try:
+                    ai_broadcast.run_bulletin(ai_broadcast.load_scripts(self.chosen.get(key)), manifest)
+                except Exception as e:
+                    logger.error(f"生成每日快報失敗：{ai_broadcast.source}_{ai_broadcast.feed_name} - {e}")
+
+    def run(self, feeds: List[Dict]) -> Dict[str, StageStats]:
+        """feeds 中每一項含 source、feed_name、rss_url"""
+        stats = self.pipeline.run(feeds)
+        self.finish()
+        self.pipeline.log_stats()
+        return stats
@@ -0,0 +1,145 @@
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+import pandas as pd
+import yaml
+from src.config.log_config import setup_logger
+from src.content_cleaner import estimate_tokens
+
+logger = setup_logger(__name__)
+
+PRE_RANKER_CONFIG_PATH = Path("./src/config/pre_ranker.yaml")
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+CJK_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+def title_shingles(title: str) -> Set[str]:
+    """標題的比對單位：英文取單字，中文取相鄰兩字"""
+    title = title.lower()
+    shingles = set(WORD_PATTERN.findall(title))
+    for run in CJK_PATTERN.findall(title):
+        shingles.update(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+    return shingles
+
+def keyword_matcher(term: str) -> Callable[[str], bool]:
+    """
+    英數字詞以字詞邊界比對，避免 "ai" 命中 "said"、"eu" 命中 "europe"；
+    含中日韓等非 ASCII 字元的詞沒有空白分隔，仍以子字串比對。
+    """
+    term = term.lower()
+    if term.isascii():
+        return re.compile(rf'(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])').search
+    return lambda value: term in value
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class PreRanker:
+    """
+    在 AIChose 呼叫 LLM 前以本地規則為候選新聞評分，只保留前 top_k 則。
+
+    分數為時效、來源權重、優先領域關鍵字三項（皆為 0-1）的加權和；
+    標題高度相似的重複報導只保留分數最高的一則。
+    """
+
+    def __init__(self, config: Optional[Dict] = None, top_k: Optional[int] = None):
+        config = config or {}
+        self.top_k = top_k if top_k is not None else config.get('top_k', 30)
+        self.weights = {'recency': 0.35, 'source': 0.15, 'keywords': 0.5, **config.get('weights', {})}
+        self.half_life = config.get('recency_half_life_hours', 24) * 3600
+        self.duplicate_threshold = config.get('duplicate_threshold', 0.6)
+        self.source_weights = config.get('source_weights', {})
+        self.keyword_saturation = config.get('keyword_saturation', 4)
+        self.keyword_groups = [
+            (group.get('weight', 1.0), [keyword_matcher(term) for term in group.get('terms', [])])
+            for group in (config.get('keywords') or {}).values()
+        ]
+
+    def recency_score(self, news_df: pd.DataFrame, now: float) -> pd.Series:
+        if 'published_ts' in news_df.columns:
+            published_ts = pd.to_numeric(news_df['published_ts'], errors='coerce')
+        else:
+            published_ts = pd.Series(float('nan'), index=news_df.index)
+        if 'published' in news_df.columns:
+            # 舊資料沒有 published_ts，退回解析 published 字串
+            parsed = pd.to_datetime(news_df['published'], errors='coerce', utc=True, format='mixed')
+            published_ts = published_ts.fillna(parsed.map(lambda value: value.timestamp() if pd.notna(value) else float('nan')))
+        age = (now - published_ts).clip(lower=0)
+        return (0.5 ** (age / self.half_life)).fillna(0.0)
+
+    def source_score(self, news_df: pd.DataFrame, source: Optional[str]) -> pd.Series:
+        default = self.source_weights.get('default', 0.5)
+        if 'source' in news_df.columns:
+            return news_df['source'].map(lambda name: self.source_weights.get(name, default)).astype(float)
+        return pd.Series(self.source_weights.get(source, default), index=news_df.index, dtype=float)
+
+    def keyword_score(self, news_df: pd.DataFrame) -> pd.Series:
+        text = (news_df.get('ai_title', pd.Series('', index=news_df.index)).fillna('').astype(str) + ' ' +
+                news_df.get('ai_summary', pd.Series('', index=news_df.index)).fillna('').astype(str)).str.lower()
+
+        def score(value: str) -> float:
+            hits = sum(weight for weight, terms in self.keyword_groups for match in terms if match(value))
+            return min(1.0, hits / self.keyword_saturation) if self.keyword_saturation else 0.0
+
+        return text.map(score)
+
+    def score(self, news_df: pd.DataFrame, source: Optional[str] = None) -> pd.Series:
+        now = time.time()
+        return (
+            self.weights['recency'] * self.recency_score(news_df, now)
+            + self.weights['source'] * self.source_score(news_df, source)
+            + self.weights['keywords'] * self.keyword_score(news_df)
+        )
+
+    def rank(self, news_df: pd.DataFrame, source: Optional[str] = None, min_keep: int = 0) -> pd.DataFrame:
+        """
+        回傳分數最高、去除重複後的 top_k 則新聞（保持原本的列順序）。
+
+        Args:
+            news_df (pd.DataFrame): 候選新聞。
+            source (Optional[str]): news_df 沒有 source 欄位時使用的來源名稱。
+            min_keep (int): 至少保留的則數，通常為要選出的新聞數量。
+        """
+        if self.top_k <= 0:
+            return news_df
+        top_k = max(self.top_k, min_keep)
+        candidates = news_df
+        if 'ai_title' in candidates.columns:
+            candidates = candidates[candidates['ai_title'].notna() & (candidates['ai_title'] != '處理失敗')]
+
+        scores = self.score(candidates, source).sort_values(ascending=False, kind='stable')
+        titles = candidates['ai_title'].fillna('').astype(str) if 'ai_title' in candidates.columns \
+            else candidates['title'].fillna('').astype(str)
+
+        kept, kept_shingles, duplicates = [], [], 0
+        for index in scores.index:
+            shingles = title_shingles(titles[index])
+            if any(jaccard(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                duplicates += 1
+                continue
+            kept.append(index)
+            kept_shingles.append(shingles)
+            if len(kept) >= top_k:
+                break
+
+        ranked = candidates.loc[sorted(kept, key=candidates.index.get_loc)]
+        logger.info(f"預排序：{len(news_df)} 則候選，略過重複 {duplicates} 則，保留 {len(ranked)} 則")
+        return ranked
+
+    @staticmethod
+    def log_token_savings(full_list: str, ranked_list: str) -> int:
+        """比較預排序前後的新聞清單文字，記錄省下的提示 token 數"""
+        before, after = estimate_tokens(full_list), estimate_tokens(ranked_list)
+        logger.info(f"預排序省下約 {before - after} 個提示 token（{before} -> {after}）")
+        return before - after
+
+def load_pre_ranker_config(config_path: Path = PRE_RANKER_CONFIG_PATH) -> Dict:
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"載入預排序設定失敗，使用預設值：{e}")
+        return {}
@@ -0,0 +1,83 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from src.article_store import get_article_key
+from src.config.log_config import setup_logger
+from src.content_cleaner import estimate_tokens
+
+logger = setup_logger(__name__)
+
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def compact_text(value, max_chars: int = 0) -> str:
+    """去除 HTML 標籤與換行，讓一則新聞剛好佔表格的一行"""
+    if value is None or isinstance(value, float) and pd.isna(value):
+        return ''
+    text = WHITESPACE_PATTERN.sub(' ', HTML_TAG_PATTERN.sub(' ', str(value))).replace('|', '/').strip()
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars].rstrip() + '…'
+    return text
+
+class CompiledNewsList:
+    """
+    把新聞清單編成精簡的表格文字，以短 ID 取代 URL。
+
+    ID 取自正規化 URL 的雜湊前幾碼，同一篇文章在不同次執行中得到相同的 ID，
+    提示內容穩定，LLM 快取也較容易命中。模型回傳 ID 後以 resolve 換回原本的 link。
+    """
+
+    def __init__(self, news_df: pd.DataFrame, columns: List[str], max_chars: Optional[Dict[str, int]] = None,
+                 id_length: int = 6):
+        self.columns = [column for column in columns if column in news_df.columns]
+        self.max_chars = max_chars or {}
+        self.id_to_link: Dict[str, str] = {}
+        self.link_to_id: Dict[str, str] = {}
+        for link in news_df['link']:
+            if link in self.link_to_id:
+                continue
+            # 正規化後相同的 URL 仍需不同的 ID，雜湊不夠長時接上原始 URL 的雜湊
+            key = get_article_key(link) + hashlib.sha1(str(link).encode('utf-8')).hexdigest()
+            length = id_length
+            while key[:length] in self.id_to_link:
+                length += 1
+            self.id_to_link[key[:length]] = link
+            self.link_to_id[link] = key[:length]
+        self.rows = news_df.drop_duplicates('link')
+
+    def render(self) -> str:
+        lines = [' | '.join(['id'] + self.columns)]
+        for record in self.rows.to_dict(orient='records'):
+            values = [compact_text(record[column], self.max_chars.get(column, 0)) for column in self.columns]
+            lines.append(' | '.join([self.link_to_id[record['link']]] + values))
+        return '\n'.join(lines)
+
+    def resolve(self, ids: Iterable[str]) -> List[str]:
+        """把模型回傳的 ID 換回 link；模型若仍回傳完整 URL 也接受，無法對應的項目略過"""
+        links = []
+        for item in ids:
+            item = str(item).strip()
+            link = self.id_to_link.get(item) or (item if item in self.link_to_id else None)
+            if link is None:
+                logger.warning(f"模型回傳了不存在的 ID，已略過：{item}")
+                continue
+            if link not in links:
+                links.append(link)
+        return links
+
+def log_prompt_usage(stage: str, prompt: str, response=None) -> Dict[str, int]:
+    """
+    記錄單次提示的輸入與輸出 token 數。
+
+    有 API 回傳的 usage 時使用實際數字，否則以本地估算為準。
+    """
+    usage = getattr(response, 'usage', None)
+    input_tokens = getattr(usage, 'prompt_tokens', None) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, 'completion_tokens', None)
+    if output_tokens is None and response is not None:
+        message = response.choices[0].message
+        output_text = message.content or ''.join(call.function.arguments for call in message.tool_calls or [])
+        output_tokens = estimate_tokens(output_text)
+    logger.info(f"提示 token 統計 [{stage}]：輸入 {input_tokens}、輸出 {output_tokens or 0}")
+    return {'input_tokens': input_tokens, 'output_tokens': output_tokens or 0}
@@ -0,0 +1,151 @@
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import yaml
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+PROXY_CONFIG_PATH = Path("./src/config/proxies.yaml")
+
+# 尚未有延遲資料的代理先以此值估算，讓新代理有機會被挑中
+DEFAULT_LATENCY = 5.0
+
+class ProxyStats:
+    """單一代理的健康狀態：成功率與延遲的 EWMA，以及斷路器狀態"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ewma_success = 1.0
+        self.ewma_latency: Optional[float] = None
+        self.opened_at: Optional[float] = None  # 斷路開始時間，None 表示斷路器關閉
+        self.probing = False  # 冷卻後正在進行探測請求
+        self.probe_thread: Optional[int] = None  # 進行探測的執行緒
+
+    @property
+    def score(self) -> float:
+        return self.ewma_success / (self.ewma_latency or DEFAULT_LATENCY)
+
+    def state(self, cooldown: float) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= cooldown:
+            return 'half_open'
+        return 'open'
+
+    def to_dict(self, cooldown: float) -> Dict:
+        return {
+            "proxy": self.address,
+            "state": self.state(cooldown),
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": round(self.ewma_success, 3),
+            "latency": round(self.ewma_latency, 2) if self.ewma_latency is not None else None,
+        }
+
+class ProxyPool:
+    """
+    受管理的代理池。
+
+    依成功率與延遲的 EWMA 為代理評分，優先挑選最快的健康代理；
+    連續失敗達門檻即斷路，冷卻後只放行一個探測請求，成功才恢復使用。
+    """
+
+    def __init__(self, proxies: List[str], timeout: float = 20, max_attempts: int = 4, ewma_alpha: float = 0.3,
+                 failure_threshold: int = 3, cooldown_seconds: float = 300, top_n: int = 3):
+        self.proxies = [ProxyStats(address) for address in proxies]
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown_seconds
+        self.top_n = max(1, top_n)
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Optional[ProxyStats]:
+        """挑選一個可用的代理，全部斷路時回傳 None"""
+        with self.lock:
+            # 冷卻結束的代理優先拿來探測，否則永遠不會恢復
+            for proxy in self.proxies:
+                if proxy.state(self.cooldown) == 'half_open' and not proxy.probing:
+                    proxy.probing = True
+                    proxy.probe_thread = threading.get_ident()
+                    return proxy
+
+            healthy = [proxy for proxy in self.proxies if proxy.state(self.cooldown) == 'closed']
+            if not healthy:
+                return None
+            healthy.sort(key=lambda proxy: proxy.score, reverse=True)
+            return random.choice(healthy[:self.top_n])
+
+    def record_success(self, proxy: ProxyStats, latency: float) -> None:
+        with self.lock:
+            proxy.successes += 1
+            proxy.consecutive_failures = 0
+            proxy.ewma_success = self.alpha + (1 - self.alpha) * proxy.ewma_success
+            if proxy.ewma_latency is None:
+                proxy.ewma_latency = latency
+            else:
+                proxy.ewma_latency = self.alpha * latency + (1 - self.alpha) * proxy.ewma_latency
+            if proxy.opened_at is not None:
+                logger.info(f"代理 {proxy.address} 探測成功，恢復使用")
+            proxy.opened_at = None
+            proxy.probing = False
+
+    def record_failure(self, proxy: ProxyStats) -> None:
+        with self.lock:
+            proxy.failures += 1
+            proxy.consecutive_failures += 1
+            proxy.ewma_success = (1 - self.alpha) * proxy.ewma_success
+            if proxy.probing or proxy.consecutive_failures >= self.failure_threshold:
+                if proxy.opened_at is None or proxy.probing:
+                    logger.warning(f"代理 {proxy.address} 連續失敗 {proxy.consecutive_failures} 次，斷路 {self.cooldown:.0f} 秒")
+                proxy.opened_at = time.time()
+            proxy.probing = False
+
+    def release(self, proxy: ProxyStats) -> None:
+        """結束一次使用；探測請求沒有記錄成功或失敗就結束時，讓代理可以再被挑來探測"""
+        with self.lock:
+            # 只由探測的執行緒結束探測，其他執行緒先前挑到同一代理的請求不影響
+            if proxy.probing and proxy.probe_thread == threading.get_ident():
+                proxy.probing = False
+
+    def stats(self) -> List[Dict]:
+        with self.lock:
+            return [proxy.to_dict(self.cooldown) for proxy in self.proxies]
+
+    def log_health(self) -> None:
+        stats = self.stats()
+        healthy = sum(1 for item in stats if item['state'] == 'closed')
+        logger.info(f"代理池狀態：健康 {healthy}/{len(stats)}")
+        for item in sorted(stats, key=lambda item: (item['state'] != 'closed', item['latency'] or float('inf'))):
+            logger.info(
+                f"  - {item['proxy']}: {item['state']}，成功 {item['successes']} / 失敗 {item['failures']}，"
+                f"成功率 {item['success_rate']:.0%}，延遲 {item['latency'] if item['latency'] is not None else 'N/A'} 秒"
+            )
+
+def load_proxy_pool(config_path: Path = PROXY_CONFIG_PATH) -> ProxyPool:
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"載入代理設定失敗：{e}")
+        config = {}
+    proxies = config.pop('proxies', None) or []
+    return ProxyPool(proxies, **config)
+
+_pool: Optional[ProxyPool] = None
+_pool_lock = threading.Lock()
+
+def get_proxy_pool() -> ProxyPool:
+    """取得整個行程共用的代理池，讓各訂閱源累積的健康狀態互相參考"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = load_proxy_pool()
+        return _pool
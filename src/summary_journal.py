@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+class SummaryJournal:
+    """
+    單一訂閱源的摘要日誌（只附加的 JSONL），每則摘要完成就立即寫入並 fsync。
+
+    執行中斷（當機、OOM、Ctrl-C）後，下次執行會從日誌接續，已付費的 LLM 呼叫不會白費；
+    CSV 成功寫出後清除日誌。
+    """
+
+    def __init__(self, source: str, feed_name: str, journal_dir: Path = Path("./data/journal")):
+        self.path = Path(journal_dir) / f"{source}_{feed_name}.jsonl"
+        self.lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict]:
+        """讀取上次未完成的摘要，以 link 為鍵；同一 link 多筆時以最後一筆為準"""
+        if not self.path.exists():
+            return {}
+        records: Dict[str, Dict] = {}
+        corrupted = False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 最後一行可能在寫入途中被中斷
+                    logger.warning(f"略過損毀的日誌記錄：{self.path}")
+                    corrupted = True
+                    continue
+                records[record['link']] = record
+        if corrupted:
+            # 重寫成只含完整記錄的日誌，之後附加的記錄才不會接在殘缺的行後面
+            self.rewrite(records)
+        return records
+
+    def rewrite(self, records: Dict[str, Dict]) -> None:
+        with self.lock:
+            tmp_path = self.path.with_suffix('.jsonl.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def append(self, link: str, ai_title: Optional[str], ai_summary: Optional[str], content_hash: Optional[str]) -> None:
+        record = {
+            'link': link,
+            'ai_title': ai_title,
+            'ai_summary': ai_summary,
+            'content_hash': content_hash,
+            'recorded_at': time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        with self.lock:
+            if self.path.exists():
+                self.path.unlink()
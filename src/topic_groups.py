@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+TOPIC_GROUPS_PATH = Path("./data/poster/topic_groups.json")
+
+def membership_hash(links: Iterable[str]) -> str:
+    return hashlib.sha1('\n'.join(sorted(set(links))).encode('utf-8')).hexdigest()
+
+class TopicGroupStore:
+    """
+    Poster 跨執行週期保存的主題分組。
+
+    新新聞會加入既有分組或開新分組；分組在 ttl_hours 內沒有新成員就過期。
+    每個分組記錄上次摘要時的成員雜湊，成員沒變的分組不必重新摘要。
+    分組模型看過但未納入任何分組的新聞記在 seen，同樣依 ttl_hours 過期，避免每個週期重送。
+    """
+
+    def __init__(self, path: Path = TOPIC_GROUPS_PATH, ttl_hours: float = 24):
+        self.path = Path(path)
+        self.ttl = ttl_hours * 3600
+        self.data: Dict = self.load()
+        self.data.setdefault('groups', {})
+        self.data.setdefault('seen', {})
+
+    def load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"讀取主題分組失敗，將重新建立：{self.path} - {e}")
+            return {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def groups(self) -> List[Dict]:
+        """依重要性排序的有效分組"""
+        return sorted(self.data['groups'].values(), key=lambda group: group['importance_score'], reverse=True)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        expired = [group_id for group_id, group in self.data['groups'].items() if now - group['updated_at'] > self.ttl]
+        for group_id in expired:
+            del self.data['groups'][group_id]
+        self.data['seen'] = {link: seen_at for link, seen_at in self.data['seen'].items() if now - seen_at <= self.ttl}
+        if expired:
+            logger.info(f"已移除 {len(expired)} 個過期的主題分組")
+        return len(expired)
+
+    def known_links(self) -> Set[str]:
+        links = set(self.data['seen'])
+        for group in self.data['groups'].values():
+            links.update(group['links'])
+        return links
+
+    def group_of(self, link: str) -> Optional[str]:
+        for group_id, group in self.data['groups'].items():
+            if link in group['links']:
+                return group_id
+        return None
+
+    def add_links(self, group_id: str, links: Iterable[str], now: Optional[float] = None) -> int:
+        group = self.data['groups'][group_id]
+        added = [link for link in links if link not in group['links']]
+        if added:
+            group['links'].extend(added)
+            group['updated_at'] = now or time.time()
+        return len(added)
+
+    def add_group(self, tag: str, importance_score: float, links: List[str], now: Optional[float] = None) -> str:
+        now = now or time.time()
+        group_id = uuid.uuid4().hex[:8]
+        self.data['groups'][group_id] = {
+            'id': group_id,
+            'tag': tag,
+            'importance_score': importance_score,
+            'links': list(dict.fromkeys(links)),
+            'created_at': now,
+            'updated_at': now,
+        }
+        return group_id
+
+    def mark_seen(self, links: Iterable[str], now: Optional[float] = None) -> None:
+        now = now or time.time()
+        for link in links:
+            self.data['seen'][link] = now
+
+    def needs_summary(self, group: Dict) -> bool:
+        return group.get('summary') is None or group.get('summary_hash') != membership_hash(group['links'])
+
+    def set_summary(self, group_id: str, summary: Dict) -> None:
+        group = self.data['groups'][group_id]
+        group['summary'] = summary
+        group['summary_hash'] = membership_hash(group['links'])
@@ -0,0 +1,233 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.audio_cache import AudioCache
+from src.config.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# OpenAI TTS 單次輸入上限為 4096 字元，預設留一些餘裕
+TTS_MAX_INPUT_CHARS = 4096
+DEFAULT_CHUNK_CHARS = 2000
+
+# 句末標點（含中文全形標點）後接的引號或括號一併留在同一句；
+# 英文句點只有後面接空白（或結尾）時才算句末，避免切開小數與網址
+SENTENCE_PATTERN = re.compile(
+    r'(?:[^。！？!?；;.\n]|\.(?![.」』”’）)]*(?:\s|$)))*(?:[。！？!?；;.]+[」』”’）)]*\s*|\n+|$)'
+)
+WHITESPACE_PATTERN = re.compile(r'\s')
+CLAUSE_PATTERN = re.compile(r'[^，、,：:]*(?:[，、,：:]+|$)')
+
+# MPEG 音框標頭查表：索引依序為 (版本, layer) 與標頭中的位元值
+MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+MPEG_LAYERS = {1: 3, 2: 2, 3: 1}
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+def split_sentences(text: str) -> List[str]:
+    """依中英文句末標點與換行切句，標點與句間空白保留在句尾"""
+    return [match.group(0) for match in SENTENCE_PATTERN.finditer(text) if match.group(0).strip()]
+
+def split_long_sentence(sentence: str, max_chars: int) -> List[str]:
+    """單句超過上限時先在逗號、頓號處切開，仍太長才在空白處或依長度硬切"""
+    pieces, current = [], ''
+    for clause in (match.group(0) for match in CLAUSE_PATTERN.finditer(sentence)):
+        while len(clause) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            # 硬切時退到上限前最後一個空白，英文不會從單字中間切開
+            spaces = [match.end() for match in WHITESPACE_PATTERN.finditer(clause, 0, max_chars)]
+            cut = spaces[-1] if spaces else max_chars
+            pieces.append(clause[:cut])
+            clause = clause[cut:]
+        if len(current) + len(clause) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += clause
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[str]:
+    """把腳本依句子邊界組成不超過 max_chars 的片段"""
+    max_chars = min(max_chars, TTS_MAX_INPUT_CHARS)
+    chunks, current = [], ''
+    for sentence in split_sentences(text):
+        for piece in (split_long_sentence(sentence, max_chars) if len(sentence) > max_chars else [sentence]):
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current.strip())
+                current = ''
+            current += piece
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+def strip_id3(data: bytes) -> bytes:
+    """去除開頭的 ID3v2 與結尾的 ID3v1 標籤，只留下 MPEG 音框"""
+    while data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+def parse_frame_header(data: bytes, offset: int) -> Optional[Tuple[int, int, int]]:
+    """解析 offset 處的音框標頭，回傳 (音框長度, 取樣數, 取樣率)；不是有效標頭時回傳 None"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    header = int.from_bytes(data[offset:offset + 4], 'big')
+    version = MPEG_VERSIONS.get((header >> 19) & 0x3)
+    layer = MPEG_LAYERS.get((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    padding = (header >> 9) & 0x1
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if layer == 2 or version == 1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+def iter_frames(data: bytes) -> Iterator[Tuple[bytes, float]]:
+    """逐一取出 MPEG 音框與其播放秒數，遇到無法解析的位元組時往後找下一個同步字"""
+    offset = 0
+    while offset < len(data):
+        parsed = parse_frame_header(data, offset)
+        if parsed is None or offset + parsed[0] > len(data):
+            offset = data.find(b'\xff', offset + 1)
+            if offset < 0:
+                return
+            continue
+        length, samples, sample_rate = parsed
+        yield data[offset:offset + length], samples / sample_rate
+        offset += length
+
+def is_info_frame(frame: bytes) -> bool:
+    # Xing / Info / VBRI 標頭描述的是單一檔案的長度，串接後已不正確，不保留
+    head = frame[:64]
+    return b'Xing' in head or b'Info' in head or b'VBRI' in head
+
+def concat_mp3(parts: List[bytes]) -> Tuple[bytes, List[float]]:
+    """
+    依序串接多段 MP3 的音框，不重新編碼。
+
+    Returns:
+        Tuple[bytes, List[float]]: 串接後的音訊，以及每段的播放秒數。
+    """
+    frames, durations = [], []
+    for part in parts:
+        duration = 0.0
+        for index, (frame, seconds) in enumerate(iter_frames(strip_id3(part))):
+            if index == 0 and is_info_frame(frame):
+                continue
+            frames.append(frame)
+            duration += seconds
+        durations.append(duration)
+    return b''.join(frames), durations
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class TTSEngine:
+    """
+    長腳本的語音合成。
+
+    腳本依句子邊界切成不超過 max_chars 的片段，以最多 max_workers 個執行緒同時合成，
+    再依原本順序串接 MP3 音框，不經重新編碼。有 audio_cache 時每個片段先查快取，
+    refresh_cache 時略過讀取、只寫入新的結果。
+    """
+
+    def __init__(self, client, voice: str, model: str = "tts-1", max_chars: int = DEFAULT_CHUNK_CHARS,
+                 max_workers: int = 4, audio_cache: Optional[AudioCache] = None, refresh_cache: bool = False):
+        self.client = client
+        self.voice = voice
+        self.model = model
+        self.max_chars = max_chars
+        self.max_workers = max(1, max_workers)
+        self.audio_cache = audio_cache
+        self.refresh_cache = refresh_cache
+
+    def script_key(self, text: str) -> str:
+        """腳本、語音與模型的雜湊，用來判斷既有的音訊是否過期"""
+        return AudioCache.make_key(text, self.voice, self.model)
+
+    def synthesize_chunk(self, text: str) -> bytes:
+        key = self.script_key(text)
+        if self.audio_cache is not None and not self.refresh_cache:
+            cached = self.audio_cache.get(key)
+            if cached is not None:
+                return cached
+        response = self.client.audio.speech.create(model=self.model, voice=self.voice, input=text,
+                                                   response_format="mp3")
+        if self.audio_cache is not None:
+            self.audio_cache.put(key, response.content, self.voice, self.model)
+        return response.content
+
+    def synthesize_chunks(self, chunks: List[str]) -> List[bytes]:
+        if len(chunks) <= 1 or self.max_workers == 1:
+            return [self.synthesize_chunk(chunk) for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            return list(executor.map(self.synthesize_chunk, chunks))
+
+    def synthesize(self, text: str) -> bytes:
+        chunks = chunk_text(text, self.max_chars)
+        if not chunks:
+            raise ValueError("腳本內容為空，無法合成語音")
+        if len(chunks) > 1:
+            logger.info(f"腳本共 {len(text)} 字，分成 {len(chunks)} 段合成")
+        audio, _ = concat_mp3(self.synthesize_chunks(chunks))
+        return audio
+
+    def synthesize_to_file(self, text: str, output_path: Path) -> None:
+        write_atomic(Path(output_path), self.synthesize(text))
+
+    def synthesize_bulletin(self, items: List[Dict[str, str]], output_path: Path) -> List[Dict]:
+        """
+        把多則腳本合成為單一集節目，並在旁邊寫出章節索引 <output>.chapters.json。
+
+        Args:
+            items (List[Dict[str, str]]): 依播出順序排列，每則含 title 與 text。
+            output_path (Path): 輸出的 MP3 路徑。
+
+        Returns:
+            List[Dict]: 章節索引，每章含 title、start、end（秒）。
+        """
+        output_path = Path(output_path)
+        item_chunks = [chunk_text(item['text'], self.max_chars) for item in items]
+        all_chunks = [chunk for chunks in item_chunks for chunk in chunks]
+        if not all_chunks:
+            raise ValueError("沒有可合成的腳本")
+        logger.info(f"每日快報共 {len(items)} 則，分成 {len(all_chunks)} 段合成")
+        audio, durations = concat_mp3(self.synthesize_chunks(all_chunks))
+
+        chapters, position, start = [], 0, 0.0
+        for item, chunks in zip(items, item_chunks):
+            if not chunks:
+                continue
+            end = start + sum(durations[position:position + len(chunks)])
+            chapters.append({'title': item['title'], 'start': round(start, 3), 'end': round(end, 3)})
+            position += len(chunks)
+            start = end
+
+        write_atomic(output_path, audio)
+        chapters_json = json.dumps({'audio': output_path.name, 'chapters': chapters}, ensure_ascii=False, indent=2)
+        write_atomic(output_path.with_name(output_path.name + '.chapters.json'), chapters_json.encode('utf-8'))
+        return chapters
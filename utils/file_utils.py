@@ -1,5 +1,14 @@
+import os
 from pathlib import Path
 from typing import Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 常見的追蹤參數，不影響文章內容
+TRACKING_PARAM_PREFIXES = ('utm_', 'at_', 'ns_', 'mc_')
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'ocid', 'cmpid', 'cmp',
+    'smid', 'smtyp', 'ref', 'ref_src', 'partner',
+}
 
 def get_safe_filename(url: str) -> str:
     """
@@ -43,3 +52,57 @@ def get_file_path(base_dir: Union[str, Path], source: str, feed: str, filename:
         Path: 完整的文件路徑。
     """
     return ensure_dir(Path(base_dir) / f"{source}_{feed}") / filename
+
+def canonicalize_url(url: str) -> str:
+    """
+    將 URL 正規化，讓不同訂閱源中指向同一篇文章的連結得到相同的結果。
+
+    - 統一使用 https、小寫主機名並移除 www. 與預設埠號
+    - 移除追蹤參數與錨點，其餘查詢參數依名稱排序
+    - 移除路徑結尾的斜線
+
+    Args:
+        url (str): 原始 URL。
+
+    Returns:
+        str: 正規化後的 URL。
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme in ('http', 'https', ''):
+        scheme = 'https'
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/')
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
+
+def atomic_write_csv(data_frame, path: Union[str, Path], **kwargs) -> None:
+    """
+    先寫入同目錄下的暫存檔再改名取代，讀取端不會看到寫到一半的 CSV。
+
+    Args:
+        data_frame (pd.DataFrame): 要寫入的資料。
+        path (Union[str, Path]): 目標 CSV 路徑。
+        **kwargs: 傳給 DataFrame.to_csv 的其他參數。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        data_frame.to_csv(tmp_path, index=False, **kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()